@@ -1,8 +1,13 @@
+import pandas as pd
 import streamlit as st
 from utils.data_manager import DataManager
-import plotly.express as px
 from datetime import datetime, timedelta
-import pandas as pd
+from utils.charts import downsample
+from utils.metrics import timed
+
+# Frames from the data manager share their buffers with the cache every session reads;
+# with copy-on-write, a page editing one in place edits its own copy instead
+pd.set_option('mode.copy_on_write', True)
 
 # Page configuration
 st.set_page_config(
@@ -61,16 +66,17 @@ st.markdown("""
 # Dashboard Overview with enhanced metrics
 col1, col2, col3, col4 = st.columns(4)
 
-# Calculate key metrics
-sales_data = st.session_state.data_manager.get_sales_data()
-expenses_data = st.session_state.data_manager.get_expenses()
+# Calculate key metrics from the daily rollup
+with timed('dashboard.metrics') as span:
+    daily_summary = st.session_state.data_manager.get_daily_summary()
 
-# Today's metrics
-today = datetime.now().strftime('%Y-%m-%d')
-today_sales = sales_data[sales_data['date'] == today]['sale_price'].sum() if not sales_data.empty else 0
-total_revenue = sales_data['sale_price'].sum() if not sales_data.empty else 0
-total_expenses = expenses_data['amount'].sum() if not expenses_data.empty else 0
-net_profit = total_revenue - total_expenses
+    # Today's metrics
+    today = datetime.now().date()
+    today_sales = st.session_state.data_manager.get_daily_summary(today, today)['revenue'].sum()
+    total_revenue = daily_summary['revenue'].sum() if not daily_summary.empty else 0
+    total_expenses = daily_summary['expenses'].sum() if not daily_summary.empty else 0
+    net_profit = total_revenue - total_expenses
+    span.rows = len(daily_summary)
 
 with col1:
     st.metric("Today's Sales", f"${today_sales:,.2f}", delta=None)
@@ -118,17 +124,17 @@ if 'action' in st.session_state:
 
     if st.session_state.action == "Add New Sale":
         with st.form("quick_sale_form"):
-            products = st.session_state.data_manager.get_products()
+            product_index = st.session_state.data_manager.get_product_index()
             product_id = st.selectbox(
                 "Select Product",
-                products['id'].tolist(),
-                format_func=lambda x: f"{products[products['id'] == x]['name'].iloc[0]} - ${products[products['id'] == x]['price'].iloc[0]:.2f}"
+                list(product_index),
+                format_func=lambda x: f"{product_index[x].name} - ${product_index[x].price:.2f}"
             )
             quantity = st.number_input("Quantity", min_value=1, value=1)
             price = st.number_input(
                 "Price",
                 min_value=0.0,
-                value=float(products[products['id'] == product_id]['price'].iloc[0])
+                value=product_index[product_id].price
             )
 
             if st.form_submit_button("Record Sale"):
@@ -172,29 +178,31 @@ if 'action' in st.session_state:
                     st.error("Please fill in all required fields correctly.")
 
 # Recent Activity Chart
-if not sales_data.empty:
+if daily_summary['sale_count'].sum() > 0:
     st.markdown("### 📊 Recent Activity")
 
     # Last 7 days of sales
-    end_date = datetime.now()
+    end_date = datetime.now().date()
     start_date = end_date - timedelta(days=7)
 
-    sales_data['date'] = pd.to_datetime(sales_data['date'])
-    mask = (sales_data['date'] >= start_date) & (sales_data['date'] <= end_date)
-    recent_sales = sales_data.loc[mask]
-
-    if not recent_sales.empty:
-        daily_sales = recent_sales.groupby('date')['sale_price'].sum().reset_index()
-        fig = px.line(
-            daily_sales,
-            x='date',
-            y='sale_price',
-            title='Last 7 Days Sales',
-            labels={'sale_price': 'Sales ($)', 'date': 'Date'}
-        )
-        fig.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font_color='#FAFAFA'
-        )
-        st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
+    daily_sales = st.session_state.data_manager.get_daily_summary(start_date, end_date)
+    daily_sales = daily_sales[daily_sales['sale_count'] > 0]
+
+    if not daily_sales.empty:
+        with timed('dashboard.recent_activity.chart'):
+            # Imported here so sessions that draw no chart never load Plotly
+            import plotly.express as px
+
+            fig = px.line(
+                downsample(daily_sales, 'date', 'revenue'),
+                x='date',
+                y='revenue',
+                title='Last 7 Days Sales',
+                labels={'revenue': 'Sales ($)', 'date': 'Date'}
+            )
+            fig.update_layout(
+                plot_bgcolor='rgba(0,0,0,0)',
+                paper_bgcolor='rgba(0,0,0,0)',
+                font_color='#FAFAFA'
+            )
+            st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
@@ -1,11 +1,13 @@
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
 from datetime import datetime, timedelta
+from utils.analytics import get_analytics_engine
+from utils.charts import MAX_POINTS, chart_period, downsample
+from utils.metrics import timed
 
 st.set_page_config(page_title="Analytics - B&B Mobile", page_icon="📱", layout="wide")
 
+PERIOD_LABELS = {'day': 'Daily', 'week': 'Weekly', 'month': 'Monthly'}
+
 st.title("Analytics Dashboard")
 
 # Date range selector
@@ -21,131 +23,141 @@ with col2:
         datetime.now()
     )
 
-# Get data
-sales_data = st.session_state.data_manager.get_sales_data()
-expenses_data = st.session_state.data_manager.get_expenses()
-
-# Convert dates
-sales_data['date'] = pd.to_datetime(sales_data['date'])
-expenses_data['date'] = pd.to_datetime(expenses_data['date'])
-
-# Filter by date range
-sales_mask = (sales_data['date'].dt.date >= start_date) & (sales_data['date'].dt.date <= end_date)
-expenses_mask = (expenses_data['date'].dt.date >= start_date) & (expenses_data['date'].dt.date <= end_date)
-
-filtered_sales = sales_data.loc[sales_mask]
-filtered_expenses = expenses_data.loc[expenses_mask]
+# Results are memoized per date range and data version, so reruns that
+# don't change either are served without recomputing
+analytics = get_analytics_engine(st.session_state.data_manager)
 
 # Revenue Trends
 st.subheader("Revenue Trends")
-daily_revenue = filtered_sales.groupby('date')['sale_price'].sum().reset_index()
-fig_revenue = px.line(
-    daily_revenue,
-    x='date',
-    y='sale_price',
-    title='Daily Revenue',
-    labels={'sale_price': 'Revenue ($)', 'date': 'Date'}
-)
-st.plotly_chart(fig_revenue, use_container_width=True)
+daily_revenue = analytics.rolling_summary(start_date, end_date, (7, 30))
+if len(daily_revenue) > MAX_POINTS:
+    st.caption(f"Showing {MAX_POINTS} of {len(daily_revenue):,} days, keeping peaks and dips.")
+with timed('analytics.revenue.chart'):
+    import plotly.express as px
+
+    fig_revenue = px.line(
+        downsample(daily_revenue, 'date', 'revenue').rename(columns={
+            'revenue': 'Daily',
+            'revenue_7d': '7-day average',
+            'revenue_30d': '30-day average'
+        }),
+        x='date',
+        y=['Daily', '7-day average', '30-day average'],
+        title='Daily Revenue',
+        labels={'value': 'Revenue ($)', 'date': 'Date', 'variable': ''}
+    )
+    st.plotly_chart(fig_revenue, use_container_width=True)
 
 # Category Performance
 st.subheader("Category Performance")
-category_sales = filtered_sales.groupby('category').agg({
-    'sale_price': 'sum',
-    'sale_id': 'count'
-}).reset_index()
+category_sales = analytics.category_performance(start_date, end_date)
 
 col1, col2 = st.columns(2)
 
-with col1:
-    fig_category_revenue = px.pie(
-        category_sales,
-        values='sale_price',
-        names='category',
-        title='Revenue by Category'
-    )
-    st.plotly_chart(fig_category_revenue)
-
-with col2:
-    fig_category_count = px.pie(
-        category_sales,
-        values='sale_id',
-        names='category',
-        title='Number of Sales by Category'
-    )
-    st.plotly_chart(fig_category_count)
+with timed('analytics.category.chart'):
+    with col1:
+        fig_category_revenue = px.pie(
+            category_sales,
+            values='revenue',
+            names='category',
+            title='Revenue by Category'
+        )
+        st.plotly_chart(fig_category_revenue)
+
+    with col2:
+        fig_category_count = px.pie(
+            category_sales,
+            values='sale_count',
+            names='category',
+            title='Number of Sales by Category'
+        )
+        st.plotly_chart(fig_category_count)
 
 # Profit Analysis
 st.subheader("Profit Analysis")
 
-daily_profit = pd.DataFrame()
-daily_profit['date'] = pd.date_range(start=start_date, end=end_date)
-daily_profit['revenue'] = filtered_sales.groupby('date')['sale_price'].sum()
-daily_profit['expenses'] = filtered_expenses.groupby('date')['amount'].sum()
-daily_profit = daily_profit.fillna(0)
-daily_profit['profit'] = daily_profit['revenue'] - daily_profit['expenses']
-
-fig_profit = go.Figure()
-fig_profit.add_trace(go.Bar(
-    x=daily_profit['date'],
-    y=daily_profit['revenue'],
-    name='Revenue',
-    marker_color='green'
-))
-fig_profit.add_trace(go.Bar(
-    x=daily_profit['date'],
-    y=daily_profit['expenses'],
-    name='Expenses',
-    marker_color='red'
-))
-fig_profit.add_trace(go.Scatter(
-    x=daily_profit['date'],
-    y=daily_profit['profit'],
-    name='Net Profit',
-    line=dict(color='blue', width=2)
-))
-
-fig_profit.update_layout(
-    title='Daily Profit Analysis',
-    xaxis_title='Date',
-    yaxis_title='Amount ($)',
-    barmode='group'
-)
-
-st.plotly_chart(fig_profit, use_container_width=True)
+period = st.radio("Group by", list(PERIOD_LABELS), format_func=PERIOD_LABELS.get, horizontal=True)
+# Long ranges switch to coarser buckets so the chart stays within its point budget
+shown_period = chart_period(start_date, end_date, period)
+if shown_period != period:
+    st.caption(f"{PERIOD_LABELS[period]} bars would exceed {MAX_POINTS} for this range; "
+               f"showing {PERIOD_LABELS[shown_period].lower()} totals.")
+    period = shown_period
+profit_by_period = analytics.period_summary(start_date, end_date, period)
+
+with timed('analytics.profit.chart'):
+    import plotly.graph_objects as go
+
+    fig_profit = go.Figure()
+    fig_profit.add_trace(go.Bar(
+        x=profit_by_period['date'],
+        y=profit_by_period['revenue'],
+        name='Revenue',
+        marker_color='green'
+    ))
+    fig_profit.add_trace(go.Bar(
+        x=profit_by_period['date'],
+        y=profit_by_period['expenses'],
+        name='Expenses',
+        marker_color='red'
+    ))
+    fig_profit.add_trace(go.Scatter(
+        x=profit_by_period['date'],
+        y=profit_by_period['profit'],
+        name='Net Profit',
+        line=dict(color='blue', width=2)
+    ))
+
+    fig_profit.update_layout(
+        title=f'{PERIOD_LABELS[period]} Profit Analysis',
+        xaxis_title=period.title(),
+        yaxis_title='Amount ($)',
+        barmode='group'
+    )
+
+    st.plotly_chart(fig_profit, use_container_width=True)
+
+if period != 'day':
+    st.dataframe(
+        profit_by_period[['date', 'revenue', 'revenue_pct_change', 'profit', 'profit_pct_change']].iloc[::-1],
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "date": st.column_config.DateColumn(f"{period.title()} Starting"),
+            "revenue": st.column_config.NumberColumn("Revenue", format="$%.2f"),
+            "revenue_pct_change": st.column_config.NumberColumn("Revenue Change", format="%+.1f%%"),
+            "profit": st.column_config.NumberColumn("Net Profit", format="$%.2f"),
+            "profit_pct_change": st.column_config.NumberColumn("Profit Change", format="%+.1f%%")
+        }
+    )
 
 # Key Metrics
 st.subheader("Key Metrics")
 col1, col2, col3, col4 = st.columns(4)
+key_metrics = analytics.key_metrics(start_date, end_date)
 
 with col1:
-    total_revenue = filtered_sales['sale_price'].sum()
-    st.metric("Total Revenue", f"${total_revenue:,.2f}")
+    st.metric("Total Revenue", f"${key_metrics['total_revenue']:,.2f}")
 
 with col2:
-    total_expenses = filtered_expenses['amount'].sum()
-    st.metric("Total Expenses", f"${total_expenses:,.2f}")
+    st.metric("Total Expenses", f"${key_metrics['total_expenses']:,.2f}")
 
 with col3:
-    net_profit = total_revenue - total_expenses
-    st.metric("Net Profit", f"${net_profit:,.2f}")
+    st.metric("Net Profit", f"${key_metrics['net_profit']:,.2f}")
 
 with col4:
-    profit_margin = (net_profit / total_revenue * 100) if total_revenue > 0 else 0
-    st.metric("Profit Margin", f"{profit_margin:.1f}%")
+    st.metric("Profit Margin", f"{key_metrics['profit_margin']:.1f}%")
 
 # Top Products
 st.subheader("Top Products")
-top_products = filtered_sales.groupby('name').agg({
-    'sale_price': 'sum',
-    'quantity': 'sum'
-}).reset_index().sort_values('sale_price', ascending=False).head(10)
-
-fig_top_products = px.bar(
-    top_products,
-    x='name',
-    y='sale_price',
-    title='Top 10 Products by Revenue',
-    labels={'sale_price': 'Revenue ($)', 'name': 'Product'}
-)
-st.plotly_chart(fig_top_products, use_container_width=True)
\ No newline at end of file
+top_products = analytics.top_products(start_date, end_date)
+
+with timed('analytics.top_products.chart'):
+    fig_top_products = px.bar(
+        top_products,
+        x='name',
+        y='sale_price',
+        title='Top 10 Products by Revenue',
+        labels={'sale_price': 'Revenue ($)', 'name': 'Product'}
+    )
+    st.plotly_chart(fig_top_products, use_container_width=True)
\ No newline at end of file
@@ -0,0 +1,111 @@
+import streamlit as st
+from datetime import datetime
+from utils.cache import shared_cache
+from utils.metrics import metrics
+from utils.notifications import get_dispatcher
+
+st.set_page_config(page_title="Diagnostics - B&B Mobile", page_icon="📱", layout="wide")
+
+st.title("Performance Diagnostics")
+
+enabled = st.toggle(
+    "Record timings",
+    value=metrics.enabled,
+    help="Applies to every session in this server process. Start the app with BBMOBILE_METRICS=1 to record from launch."
+)
+if enabled != metrics.enabled:
+    metrics.enabled = enabled
+    st.rerun()
+
+# Cache effectiveness
+st.subheader("Cache")
+cache_stats = {
+    name: {'hits': hits, 'misses': misses}
+    for name, (hits, misses) in sorted(shared_cache.stats.items())
+}
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.metric("Cache Hits", f"{shared_cache.hits:,}")
+with col2:
+    st.metric("Cache Misses", f"{shared_cache.misses:,}")
+with col3:
+    lookups = shared_cache.hits + shared_cache.misses
+    st.metric("Hit Rate", f"{shared_cache.hits / lookups * 100:.1f}%" if lookups else "-")
+
+if cache_stats:
+    st.dataframe(
+        [{'name': name, **counts} for name, counts in cache_stats.items()],
+        use_container_width=True,
+        hide_index=True,
+        column_config={"name": "Cached Data", "hits": "Hits", "misses": "Misses (loads)"}
+    )
+
+# SMS notifications
+notifier = get_dispatcher()
+if notifier is not None:
+    st.subheader("SMS Notifications")
+    notifier_stats = notifier.stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Queued", notifier_stats['queued'])
+    with col2:
+        st.metric("Sent", notifier_stats['sent'])
+    with col3:
+        st.metric("Dropped", notifier_stats['dropped'])
+    with col4:
+        st.metric("Failed", notifier_stats['failed'])
+    if notifier_stats['last_error']:
+        st.caption(f"Last error: {notifier_stats['last_error']}")
+    if st.button("Send Today's Summary"):
+        if st.session_state.data_manager.send_daily_summary():
+            st.success("Summary queued.")
+        else:
+            st.warning("The notification queue is full; try again shortly.")
+
+# Timings
+st.subheader("Timings")
+summary = metrics.summary()
+
+if summary.empty:
+    st.info("No timings recorded yet." if metrics.enabled else "Timing is off. Turn on recording above.")
+else:
+    st.dataframe(
+        summary,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "name": "Section",
+            "calls": "Calls",
+            "mean_ms": st.column_config.NumberColumn("Mean (ms)", format="%.2f"),
+            "p50_ms": st.column_config.NumberColumn("p50 (ms)", format="%.2f"),
+            "p95_ms": st.column_config.NumberColumn("p95 (ms)", format="%.2f"),
+            "max_ms": st.column_config.NumberColumn("Max (ms)", format="%.2f"),
+            "total_ms": st.column_config.NumberColumn("Total (ms)", format="%.1f"),
+            "rows": "Rows Scanned"
+        }
+    )
+
+    import plotly.express as px
+
+    name = st.selectbox("Latency histogram for", summary['name'].tolist())
+    fig_histogram = px.bar(
+        metrics.histogram(name),
+        x='bucket',
+        y='calls',
+        title=f'Latency of {name}',
+        labels={'bucket': 'Latency', 'calls': 'Calls'}
+    )
+    st.plotly_chart(fig_histogram, use_container_width=True)
+
+col1, col2 = st.columns(2)
+with col1:
+    st.download_button(
+        "Export JSON Log",
+        metrics.to_json(cache_stats),
+        file_name=f"bbmobile_metrics_{datetime.now():%Y%m%d_%H%M%S}.json",
+        mime="application/json"
+    )
+with col2:
+    if st.button("Reset Timings"):
+        metrics.reset()
+        st.rerun()
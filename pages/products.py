@@ -4,6 +4,25 @@ from datetime import datetime
 
 st.set_page_config(page_title="Products - B&B Mobile", page_icon="📱")
 
+SORT_OPTIONS = {'id': 'Product ID', 'name': 'Name', 'category': 'Category', 'price': 'Price',
+                'sale_count': 'Sales', 'last_sold': 'Last Sold', 'created_at': 'Added Date'}
+PAGE_SIZES = [25, 50, 100, 250]
+
+CATEGORIES = [
+    "Phones - New",
+    "Phones - Used",
+    "Screen Protectors",
+    "Phone Cases",
+    "Chargers & Cables",
+    "Batteries",
+    "Memory Cards",
+    "Screen Repair",
+    "Battery Replacement",
+    "Other Repairs",
+    "Accessories",
+    "Other"
+]
+
 st.title("Product Management")
 
 # Product List
@@ -21,16 +40,30 @@ with col2:
         products['category'].unique() if not products.empty else []
     )
 
-filtered_products = products
-if search:
-    filtered_products = filtered_products[filtered_products['name'].str.contains(search, case=False)]
-if category_filter:
-    filtered_products = filtered_products[filtered_products['category'].isin(category_filter)]
+col1, col2, col3 = st.columns(3)
+with col1:
+    sort = st.selectbox("Sort by", list(SORT_OPTIONS), format_func=SORT_OPTIONS.get)
+with col2:
+    descending = st.toggle("Descending")
+with col3:
+    page_size = st.selectbox("Rows per page", PAGE_SIZES)
+if search and st.checkbox("Best sellers first", help="Rank matches by how often they sold"):
+    sort, descending = 'sale_count', True
+
+# Only the visible page is filtered into a frame and sent to the browser
+page_number = st.session_state.get('products_page', 1)
+page = st.session_state.data_manager.get_products_page(
+    (page_number - 1) * page_size, page_size, sort, descending, search, category_filter
+)
+if page.rows.empty and page.total:
+    page_number = 1
+    page = st.session_state.data_manager.get_products_page(0, page_size, sort, descending, search, category_filter)
+st.session_state.products_page = page_number
 
 # Display products in a table with sorting
-if not filtered_products.empty:
+if not page.rows.empty:
     st.dataframe(
-        filtered_products[['id', 'name', 'category', 'price', 'created_at']],
+        page.rows[['id', 'name', 'category', 'price', 'sale_count', 'last_sold', 'created_at']],
         use_container_width=True,
         hide_index=True,
         column_config={
@@ -41,9 +74,15 @@ if not filtered_products.empty:
                 "Price",
                 format="$%.2f"
             ),
+            "sale_count": "Sales",
+            "last_sold": st.column_config.DateColumn("Last Sold"),
             "created_at": "Added Date"
         }
     )
+    st.number_input(
+        f"Page (of {page.pages:,}, {page.total:,} products)",
+        min_value=1, max_value=page.pages, key='products_page'
+    )
 else:
     st.info("No products found.")
 
@@ -51,23 +90,7 @@ else:
 st.subheader("Add New Product")
 with st.form("add_product_form"):
     name = st.text_input("Product Name")
-    category = st.selectbox(
-        "Category",
-        [
-            "Phones - New",
-            "Phones - Used",
-            "Screen Protectors",
-            "Phone Cases",
-            "Chargers & Cables",
-            "Batteries",
-            "Memory Cards",
-            "Screen Repair",
-            "Battery Replacement",
-            "Other Repairs",
-            "Accessories",
-            "Other"
-        ]
-    )
+    category = st.selectbox("Category", CATEGORIES)
     col1, col2 = st.columns(2)
     with col1:
         price = st.number_input("Price", min_value=0.0, step=0.01)
@@ -85,15 +108,45 @@ with st.form("add_product_form"):
         else:
             st.error("Please fill in all required fields correctly.")
 
+# Edit product
+st.subheader("Edit Product")
+if not products.empty:
+    product_index = st.session_state.data_manager.get_product_index()
+    product_to_edit = st.selectbox(
+        "Select product to edit",
+        list(product_index),
+        format_func=lambda x: f"{product_index[x].name} (ID: {x})"
+    )
+    current = product_index[product_to_edit]
+
+    with st.form("edit_product_form"):
+        new_name = st.text_input("Product Name", value=current.name)
+        category_options = CATEGORIES if current.category in CATEGORIES else CATEGORIES + [current.category]
+        new_category = st.selectbox("Category", category_options, index=category_options.index(current.category))
+        new_price = st.number_input("Price", min_value=0.0, step=0.01, value=current.price)
+
+        if st.form_submit_button("Save Changes"):
+            if new_name:
+                st.session_state.data_manager.update_product(
+                    product_to_edit, name=new_name, category=new_category, price=new_price
+                )
+                st.success("Product updated successfully!")
+                st.rerun()
+            else:
+                st.error("Please fill in all required fields correctly.")
+else:
+    st.info("No products available to edit.")
+
 # Remove product
 st.subheader("Remove Product")
 if not products.empty:
     col1, col2 = st.columns([3, 1])
     with col1:
+        product_index = st.session_state.data_manager.get_product_index()
         product_to_remove = st.selectbox(
             "Select product to remove",
-            products['id'].tolist(),
-            format_func=lambda x: f"{products[products['id'] == x]['name'].iloc[0]} (ID: {x}) - ${products[products['id'] == x]['price'].iloc[0]:.2f}"
+            list(product_index),
+            format_func=lambda x: f"{product_index[x].name} (ID: {x}) - ${product_index[x].price:.2f}"
         )
     with col2:
         if st.button("Remove Selected Product", type="secondary"):
@@ -1,9 +1,15 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
+from utils.export import EXPORT_FORMATS
+from utils.metrics import timed
 
 st.set_page_config(page_title="Sales - B&B Mobile", page_icon="📱")
 
+SORT_OPTIONS = {'date': 'Date', 'sale_id': 'Sale ID', 'sale_price': 'Price', 'quantity': 'Quantity',
+                'name': 'Product', 'category': 'Category'}
+PAGE_SIZES = [25, 50, 100, 250]
+
 # Custom CSS for mobile responsiveness
 st.markdown("""
     <style>
@@ -30,30 +36,63 @@ st.title("Sales Management")
 
 # Sales Entry
 st.subheader("Record New Sale")
-products = st.session_state.data_manager.get_products()
+product_index = st.session_state.data_manager.get_product_index()
+
+if 'cart' not in st.session_state:
+    st.session_state.cart = []
 
-if products.empty:
+if not product_index:
     st.warning("No products available. Please add products first.")
 else:
     with st.form("sales_entry_form"):
         product_id = st.selectbox(
             "Select Product",
-            products['id'].tolist(),
-            format_func=lambda x: f"{products[products['id'] == x]['name'].iloc[0]} - ${products[products['id'] == x]['price'].iloc[0]:.2f}"
+            list(product_index),
+            format_func=lambda x: f"{product_index[x].name} - ${product_index[x].price:.2f}"
         )
 
         # Get default price safely
-        selected_product = products[products['id'] == product_id]
-        default_price = float(selected_product['price'].iloc[0]) if not selected_product.empty else 0.0
+        selected_product = product_index.get(product_id)
+        default_price = selected_product.price if selected_product is not None else 0.0
 
         quantity = st.number_input("Quantity", min_value=1, value=1)
         price = st.number_input("Price", min_value=0.0, value=default_price)
 
-        submitted = st.form_submit_button("Record Sale")
-        if submitted:
-            new_sale_id = st.session_state.data_manager.add_sale(product_id, quantity, price)
-            st.success(f"Sale #{new_sale_id} recorded successfully!")
-            st.rerun()
+        if st.form_submit_button("Add to Cart"):
+            st.session_state.cart.append((product_id, int(quantity), float(price)))
+
+    # Drop items whose product was removed since they were added
+    cart = [item for item in st.session_state.cart if item[0] in product_index]
+    st.session_state.cart = cart
+
+    if cart:
+        cart_df = pd.DataFrame(
+            [(product_index[product_id].name, quantity, price) for product_id, quantity, price in cart],
+            columns=['name', 'quantity', 'price']
+        )
+        st.dataframe(
+            cart_df,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "name": "Product",
+                "quantity": "Quantity",
+                "price": st.column_config.NumberColumn("Price", format="$%.2f")
+            }
+        )
+        st.metric("Cart Total", f"${cart_df['price'].sum():,.2f}")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Complete Sale", type="primary"):
+                transaction_id, sale_ids = st.session_state.data_manager.add_transaction(cart)
+                st.session_state.cart = []
+                st.success(f"Transaction #{transaction_id} recorded with {len(sale_ids)} item(s)!")
+                st.rerun()
+        with col2:
+            if st.button("Clear Cart"):
+                st.session_state.cart = []
+                st.rerun()
 
 # Sales History
 st.subheader("Sales History")
@@ -71,61 +110,91 @@ with col2:
         datetime.now()
     )
 
-sales_data = st.session_state.data_manager.get_sales_data()
-
-if sales_data.empty:
-    st.info("No sales records found.")
-else:
-    # Filter by date
-    sales_data['date'] = pd.to_datetime(sales_data['date'])
-    mask = (sales_data['date'].dt.date >= start_date) & (sales_data['date'].dt.date <= end_date)
-    filtered_sales = sales_data.loc[mask]
-
-    if not filtered_sales.empty:
-        # Display sales summary
-        total_sales = filtered_sales['sale_price'].sum()
-        total_items = filtered_sales['quantity'].sum()
-
-        col1, col2 = st.columns(2)
-        with col1:
-            st.metric("Total Sales", f"${total_sales:,.2f}")
-        with col2:
-            st.metric("Items Sold", int(total_items))
-
-        # Display detailed sales table
-        st.dataframe(
-            filtered_sales[['sale_id', 'date', 'name', 'category', 'quantity', 'sale_price']],
-            use_container_width=True,
-            hide_index=True,
-            column_config={
-                "sale_id": "Sale ID",
-                "date": "Date",
-                "name": "Product",
-                "category": "Category",
-                "quantity": "Quantity",
-                "sale_price": st.column_config.NumberColumn(
-                    "Price",
-                    format="$%.2f"
-                )
-            }
+# Totals come from the daily rollup; the table below only ever loads one page of sales
+daily_summary = st.session_state.data_manager.get_daily_summary(start_date, end_date)
+
+if daily_summary['sale_count'].sum() > 0:
+    # Display sales summary
+    total_sales = daily_summary['revenue'].sum()
+    total_items = daily_summary['quantity'].sum()
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Total Sales", f"${total_sales:,.2f}")
+    with col2:
+        st.metric("Items Sold", int(total_items))
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        sort = st.selectbox("Sort by", list(SORT_OPTIONS), format_func=SORT_OPTIONS.get)
+    with col2:
+        descending = st.toggle("Newest / largest first", value=True)
+    with col3:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES)
+
+    with timed('sales.history.load') as span:
+        page_number = st.session_state.get('sales_page', 1)
+        page = st.session_state.data_manager.get_sales_page(
+            start_date, end_date, (page_number - 1) * page_size, page_size, sort, descending
         )
-
-        # Remove sale section
-        with st.expander("Remove Sale"):
-            sale_to_remove = st.selectbox(
-                "Select sale to remove",
-                filtered_sales['sale_id'].tolist(),
-                format_func=lambda x: f"Sale #{x} - {filtered_sales[filtered_sales['sale_id'] == x]['name'].iloc[0]} - ${filtered_sales[filtered_sales['sale_id'] == x]['sale_price'].iloc[0]:.2f}"
+        if page.rows.empty and page.total:
+            # The range or page size changed under a later page; go back to the first
+            page_number = 1
+            page = st.session_state.data_manager.get_sales_page(start_date, end_date, 0, page_size, sort, descending)
+        st.session_state.sales_page = page_number
+        span.rows = len(page.rows)
+
+    # Display detailed sales table
+    st.dataframe(
+        page.rows[['sale_id', 'date', 'name', 'category', 'quantity', 'sale_price']],
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "sale_id": "Sale ID",
+            "date": st.column_config.DateColumn("Date"),
+            "name": "Product",
+            "category": "Category",
+            "quantity": "Quantity",
+            "sale_price": st.column_config.NumberColumn(
+                "Price",
+                format="$%.2f"
             )
+        }
+    )
+    st.number_input(
+        f"Page (of {page.pages:,}, {page.total:,} sales)",
+        min_value=1, max_value=page.pages, key='sales_page'
+    )
 
-            if st.button("Remove Selected Sale", type="secondary"):
-                st.session_state.data_manager.remove_sale(sale_to_remove)
-                st.success(f"Sale #{sale_to_remove} removed successfully!")
-                st.rerun()
+    # Remove sale section
+    with st.expander("Remove Sale"):
+        page_sales = {
+            sale_id: (name, sale_price)
+            for sale_id, name, sale_price in zip(page.rows['sale_id'], page.rows['name'], page.rows['sale_price'])
+        }
+        sale_to_remove = st.selectbox(
+            "Select sale to remove (from this page)",
+            list(page_sales),
+            format_func=lambda x: f"Sale #{x} - {page_sales[x][0]} - ${page_sales[x][1]:.2f}"
+        )
+
+        if st.button("Remove Selected Sale", type="secondary"):
+            st.session_state.data_manager.remove_sale(sale_to_remove)
+            st.success(f"Sale #{sale_to_remove} removed successfully!")
+            st.rerun()
 
-        # Export option
-        if st.button("Export to CSV"):
-            filtered_sales.to_csv("sales_export.csv", index=False)
-            st.success("Sales data exported to sales_export.csv")
-    else:
-        st.info("No sales data for the selected period.")
\ No newline at end of file
+    # Export option
+    with st.expander("Export Sales"):
+        export_format = st.radio("Format", list(EXPORT_FORMATS), format_func=str.upper, horizontal=True)
+
+        if st.button("Prepare Export"):
+            # Streamlit needs the whole payload, but it is built chunk by chunk without a temp file.
+            # It is not kept in the session, so it is freed once the button has been sent.
+            st.download_button(
+                f"Download {export_format.upper()}",
+                b''.join(st.session_state.data_manager.export_sales(start_date, end_date, export_format)),
+                file_name=f"sales_{start_date}_{end_date}.{export_format}",
+                mime=EXPORT_FORMATS[export_format]
+            )
+else:
+    st.info("No sales data for the selected period.")
\ No newline at end of file
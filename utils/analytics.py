@@ -0,0 +1,167 @@
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Callable, Optional
+
+import pandas as pd
+
+from utils.metrics import timed
+from utils.storage import iso_date
+from utils.timeseries import (
+    SERIES_COLUMNS, calendar, lookback_start, period_deltas, period_start, resample, rolling_windows
+)
+
+
+def category_performance(category_summary: pd.DataFrame) -> pd.DataFrame:
+    """Revenue and sale count per category that sold anything"""
+    category_sales = category_summary.groupby('category', observed=True).agg({
+        'revenue': 'sum',
+        'sale_count': 'sum'
+    }).reset_index()
+    return category_sales[category_sales['sale_count'] > 0].reset_index(drop=True)
+
+
+def period_summary(daily_summary: pd.DataFrame, start_date: date, end_date: date,
+                   period: str = 'day') -> pd.DataFrame:
+    """Revenue, expenses and profit per day, week or month, with changes from the period before.
+
+    Periods are whole, starting from the one containing start_date; the
+    last one runs to end_date. daily_summary must reach back to
+    lookback_start(start_date, period) for the first period's change.
+    """
+    buckets = resample(calendar(daily_summary, lookback_start(start_date, period), end_date), period)
+    summary = pd.concat([buckets[SERIES_COLUMNS], period_deltas(buckets)], axis=1)
+    return summary.loc[pd.Timestamp(period_start(start_date, period)):].reset_index()
+
+
+def rolling_summary(daily_summary: pd.DataFrame, start_date: date, end_date: date,
+                    windows: tuple = (7, 30)) -> pd.DataFrame:
+    """Daily revenue, expenses and profit alongside their trailing averages, e.g. revenue_7d.
+
+    daily_summary must reach back to lookback_start(start_date, windows=windows)
+    so the first days' windows are full.
+    """
+    daily = calendar(daily_summary, lookback_start(start_date, windows=windows), end_date)
+    rolled = pd.concat([daily[SERIES_COLUMNS], rolling_windows(daily, windows)], axis=1)
+    return rolled.loc[pd.Timestamp(start_date):].reset_index()
+
+
+def key_metrics(daily_summary: pd.DataFrame) -> dict:
+    """Total revenue, expenses, net profit and profit margin"""
+    total_revenue = float(daily_summary['revenue'].sum())
+    total_expenses = float(daily_summary['expenses'].sum())
+    net_profit = total_revenue - total_expenses
+    return {
+        'total_revenue': total_revenue,
+        'total_expenses': total_expenses,
+        'net_profit': net_profit,
+        'profit_margin': (net_profit / total_revenue * 100) if total_revenue > 0 else 0.0
+    }
+
+
+def top_products(sales: pd.DataFrame, n: int = 10) -> pd.DataFrame:
+    """The n products with the most revenue, with their revenue and quantity sold"""
+    return sales.groupby('name', observed=True).agg({
+        'sale_price': 'sum',
+        'quantity': 'sum'
+    }).reset_index().sort_values('sale_price', ascending=False).head(n).reset_index(drop=True)
+
+
+class AnalyticsEngine:
+    """The analytics page's computations over one data source, memoized.
+
+    Results are keyed by the date range, any other arguments and the
+    version of the tables they read, and evicted least recently used
+    first. A write changes the version, so stale results are never served
+    and simply age out. Nothing here needs Streamlit: build one around a
+    DataManager and call it directly.
+
+    Results are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, data_manager, maxsize: int = 64):
+        self.data_manager = data_manager
+        self.maxsize = maxsize
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _memoized(self, name: str, tables: tuple, args: tuple, compute: Callable[[], object]):
+        key = (name, args, self.data_manager.backend.fingerprint(*tables))
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return self._results[key]
+            self.misses += 1
+
+        with timed(f"AnalyticsEngine.{name}"):
+            result = compute()
+
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _range(start_date: Optional[date], end_date: Optional[date]) -> tuple:
+        return (
+            iso_date(start_date) if start_date is not None else None,
+            iso_date(end_date) if end_date is not None else None
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+
+    def category_performance(self, start_date: date, end_date: date) -> pd.DataFrame:
+        return self._memoized(
+            'category_performance', ('daily_category_rollup',), self._range(start_date, end_date),
+            lambda: category_performance(self.data_manager.get_category_summary(start_date, end_date))
+        )
+
+    def period_summary(self, start_date: date, end_date: date, period: str = 'day') -> pd.DataFrame:
+        return self._memoized(
+            'period_summary', ('daily_rollup',), self._range(start_date, end_date) + (period,),
+            lambda: period_summary(
+                self.data_manager.get_daily_summary(lookback_start(start_date, period), end_date),
+                start_date, end_date, period
+            )
+        )
+
+    def rolling_summary(self, start_date: date, end_date: date, windows: tuple = (7, 30)) -> pd.DataFrame:
+        return self._memoized(
+            'rolling_summary', ('daily_rollup',), self._range(start_date, end_date) + (tuple(windows),),
+            lambda: rolling_summary(
+                self.data_manager.get_daily_summary(lookback_start(start_date, windows=windows), end_date),
+                start_date, end_date, tuple(windows)
+            )
+        )
+
+    def key_metrics(self, start_date: date, end_date: date) -> dict:
+        return self._memoized(
+            'key_metrics', ('daily_rollup',), self._range(start_date, end_date),
+            lambda: key_metrics(self.data_manager.get_daily_summary(start_date, end_date))
+        )
+
+    def top_products(self, start_date: date, end_date: date, n: int = 10) -> pd.DataFrame:
+        return self._memoized(
+            'top_products', ('sales', 'products'), self._range(start_date, end_date) + (n,),
+            lambda: top_products(self.data_manager.get_sales_data(start_date, end_date), n)
+        )
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_analytics_engine(data_manager) -> AnalyticsEngine:
+    """The process-wide analytics engine for a DataManager's data source"""
+    key = data_manager.backend.cache_key
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = AnalyticsEngine(data_manager)
+        return _engines[key]
@@ -0,0 +1,277 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils import analytics
+from utils.cache import shared_cache
+from utils.storage import get_backend
+from utils.timeseries import lookback_start
+
+BENCH_CATEGORIES = ['Phones', 'Accessories', 'Repairs', 'Other']
+
+# Marker written next to generated data so a reused directory is known to match its config
+CONFIG_FILE = 'bench_config.json'
+
+
+@dataclass
+class BenchConfig:
+    """Shape of the synthetic data set; the same config always generates the same data"""
+    products: int = 50
+    sales: int = 100_000
+    days: int = 365
+    end: str = '2024-12-31'
+    seed: int = 0
+
+    @property
+    def end_date(self) -> date:
+        return date.fromisoformat(self.end)
+
+    @property
+    def start_date(self) -> date:
+        return self.end_date - timedelta(days=self.days - 1)
+
+
+def generate_data(data_dir: str, config: BenchConfig, backend: str = 'csv',
+                  chunksize: int = 500_000) -> None:
+    """Fill an empty data directory with deterministic products, sales and expenses.
+
+    Sales are generated and written a chunk at a time, so row counts in
+    the millions don't need the whole table in memory. Writes go through
+    the data manager's write queue, like the app's, so they never race a
+    background log compaction.
+    """
+    from utils.data_manager import DataManager
+
+    data_manager = DataManager(data_dir, get_backend(data_dir, backend))
+    store = data_manager.backend
+
+    def insert_many(table: str, df: pd.DataFrame) -> range:
+        return data_manager._writer.run(lambda: store.insert_many(table, df))
+
+    rng = np.random.default_rng(config.seed)
+
+    prices = rng.integers(5, 500, config.products) * 10.0
+    product_ids = np.asarray(insert_many('products', pd.DataFrame({
+        'name': [f"Product {i:05d}" for i in range(config.products)],
+        'category': rng.choice(BENCH_CATEGORIES, config.products),
+        'price': prices,
+        'created_at': f"{config.start_date.isoformat()} 09:00:00",
+        'notes': ''
+    })))
+
+    start = np.datetime64(config.start_date.isoformat())
+    for offset in range(0, config.sales, chunksize):
+        n = min(chunksize, config.sales - offset)
+        picks = rng.integers(0, config.products, n)
+        quantity = rng.integers(1, 4, n)
+        dates = start + rng.integers(0, config.days, n).astype('timedelta64[D]')
+        insert_many('sales', pd.DataFrame({
+            'product_id': product_ids[picks],
+            'quantity': quantity,
+            'price': prices[picks] * quantity,
+            'date': pd.to_datetime(dates).strftime('%Y-%m-%d')
+        }))
+
+    days = pd.date_range(config.start_date, config.end_date)
+    insert_many('expenses', pd.DataFrame({
+        'description': 'Operating costs',
+        'amount': rng.integers(50, 500, len(days)) * 1.0,
+        'date': days.strftime('%Y-%m-%d')
+    }))
+
+    data_manager.rebuild_rollups()
+    with open(os.path.join(data_dir, CONFIG_FILE), 'w') as f:
+        json.dump({**asdict(config), 'backend': backend}, f)
+
+
+class Benchmark(NamedTuple):
+    """`setup` runs untimed before each run; its result is passed to `run`"""
+    run: Callable
+    setup: Optional[Callable] = None
+    warm: bool = True
+
+
+def _dashboard(data_manager, config: BenchConfig) -> dict:
+    # The aggregations main.py does on every load
+    today = config.end_date
+    daily_summary = data_manager.get_daily_summary()
+    return {
+        'today_sales': data_manager.get_daily_summary(today, today)['revenue'].sum(),
+        'total_revenue': daily_summary['revenue'].sum(),
+        'total_expenses': daily_summary['expenses'].sum(),
+        'sale_count': daily_summary['sale_count'].sum(),
+        'last_7_days': data_manager.get_daily_summary(today - timedelta(days=7), today)
+    }
+
+
+def _analytics(data_manager, config: BenchConfig) -> dict:
+    # What pages/analytics.py computes for its default 30-day range, without memoization
+    end_date = config.end_date
+    start_date = end_date - timedelta(days=30)
+    daily_summary = data_manager.get_daily_summary(start_date, end_date)
+    history = data_manager.get_daily_summary(lookback_start(start_date, windows=(7, 30)), end_date)
+    return {
+        'daily_revenue': analytics.rolling_summary(history, start_date, end_date, (7, 30)),
+        'category_sales': analytics.category_performance(data_manager.get_category_summary(start_date, end_date)),
+        'daily_profit': analytics.period_summary(history, start_date, end_date, 'day'),
+        'key_metrics': analytics.key_metrics(daily_summary),
+        'top_products': analytics.top_products(data_manager.get_sales_data(start_date, end_date))
+    }
+
+
+def _benchmarks(config: BenchConfig) -> Dict[str, Benchmark]:
+    recent = (config.end_date - timedelta(days=30), config.end_date)
+    return {
+        'load_sales_cold': Benchmark(
+            run=lambda dm, _: dm.get_sales_data(),
+            setup=lambda dm: (shared_cache.invalidate(), dm._snapshot_store('sales').discard('sales')),
+            warm=False
+        ),
+        'load_sales_snapshot': Benchmark(
+            run=lambda dm, _: dm.get_sales_data(),
+            setup=lambda dm: (dm._snapshot_store('sales').flush(), shared_cache.invalidate())
+        ),
+        'get_sales_data_all': Benchmark(run=lambda dm, _: dm.get_sales_data()),
+        'get_sales_data_30d': Benchmark(run=lambda dm, _: dm.get_sales_data(*recent)),
+        'add_sale': Benchmark(run=lambda dm, _: dm.add_sale(1, 1, 100.0)),
+        'add_product': Benchmark(run=lambda dm, _: dm.add_product("Benchmark product", 'Other', 10.0)),
+        'remove_product': Benchmark(
+            run=lambda dm, product_id: dm.remove_product(product_id),
+            setup=lambda dm: dm.add_product("Benchmark product", 'Other', 10.0)
+        ),
+        'search_products': Benchmark(run=lambda dm, _: dm.search_products('product 0004')),
+        'dashboard_aggregations': Benchmark(run=lambda dm, _: _dashboard(dm, config)),
+        'analytics_aggregations': Benchmark(run=lambda dm, _: _analytics(dm, config)),
+    }
+
+
+BENCHMARK_NAMES = list(_benchmarks(BenchConfig()))
+
+
+def run_benchmarks(data_manager, config: BenchConfig, repeat: int = 5,
+                   only: Optional[List[str]] = None) -> Dict[str, dict]:
+    """Time each benchmark `repeat` times; returns seconds per benchmark"""
+    results = {}
+    for name, benchmark in _benchmarks(config).items():
+        if only and name not in only:
+            continue
+        if benchmark.warm:
+            benchmark.run(data_manager, benchmark.setup(data_manager) if benchmark.setup else None)
+
+        times = []
+        for _ in range(repeat):
+            arg = benchmark.setup(data_manager) if benchmark.setup else None
+            started = time.perf_counter()
+            benchmark.run(data_manager, arg)
+            times.append(time.perf_counter() - started)
+        results[name] = {'median': statistics.median(times), 'min': min(times), 'runs': repeat}
+    return results
+
+
+def find_regressions(results: dict, baseline: dict, threshold: float = 0.25,
+                     noise_floor: float = 0.001) -> List[str]:
+    """Benchmarks whose median is more than `threshold` slower than the baseline.
+
+    Differences under `noise_floor` seconds are ignored, since timings that
+    small mostly measure the machine rather than the code.
+    """
+    regressions = []
+    for name, current in results['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        slower = current['median'] - before['median']
+        if slower > noise_floor and current['median'] > before['median'] * (1 + threshold):
+            regressions.append(
+                f"{name}: {before['median'] * 1000:.2f}ms -> {current['median'] * 1000:.2f}ms "
+                f"({current['median'] / before['median']:.2f}x)"
+            )
+    return regressions
+
+
+def _prepare(data_dir: str, config: BenchConfig, backend: str) -> None:
+    marker = os.path.join(data_dir, CONFIG_FILE)
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if json.load(f) == {**asdict(config), 'backend': backend}:
+                return
+        raise SystemExit(f"{data_dir} holds data generated with a different config; use an empty directory")
+    if os.path.isdir(data_dir) and os.listdir(data_dir):
+        raise SystemExit(f"{data_dir} is not empty; benchmark data needs a directory of its own")
+
+    started = time.perf_counter()
+    generate_data(data_dir, config, backend)
+    print(f"Generated {config.sales:,} sales over {config.days} days in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    from utils.data_manager import DataManager
+
+    parser = argparse.ArgumentParser(description="Benchmark DataManager and the page aggregations on synthetic data")
+    parser.add_argument('--products', type=int, default=BenchConfig.products)
+    parser.add_argument('--sales', type=int, default=BenchConfig.sales, help="Sales rows to generate (up to 10M)")
+    parser.add_argument('--days', type=int, default=BenchConfig.days)
+    parser.add_argument('--seed', type=int, default=BenchConfig.seed)
+    parser.add_argument('--backend', choices=['csv', 'partitioned', 'sqlite'], default='csv')
+    parser.add_argument('--data-dir', help="Keep the generated data here and reuse it on later runs (benchmark writes accumulate)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', nargs='+', choices=BENCHMARK_NAMES)
+    parser.add_argument('--save', help="Write the results to this JSON file, e.g. as a new baseline")
+    parser.add_argument('--baseline', help="Compare against a saved JSON baseline and flag regressions")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    # As main.py does, so the benchmark measures the app's pandas mode
+    pd.set_option('mode.copy_on_write', True)
+    config = BenchConfig(products=args.products, sales=args.sales, days=args.days, seed=args.seed)
+    with tempfile.TemporaryDirectory() as scratch:
+        data_dir = args.data_dir or scratch
+        _prepare(data_dir, config, args.backend)
+        data_manager = DataManager(data_dir, get_backend(data_dir, args.backend))
+        results = {
+            'config': asdict(config),
+            'backend': args.backend,
+            'environment': {
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'numpy': np.__version__,
+                'machine': platform.machine()
+            },
+            'results': run_benchmarks(data_manager, config, args.repeat, args.only)
+        }
+
+    for name, timing in results['results'].items():
+        print(f"{name:<24} median {timing['median'] * 1000:10.2f}ms   min {timing['min'] * 1000:10.2f}ms")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if (baseline['config'], baseline['backend']) != (results['config'], results['backend']):
+            print("Warning: the baseline was recorded with a different data config or backend")
+        regressions = find_regressions(results, baseline, args.threshold)
+        if regressions:
+            print("Regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
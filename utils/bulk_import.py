@@ -0,0 +1,138 @@
+import argparse
+from dataclasses import dataclass, field
+from typing import Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.storage import DATE_FORMAT
+
+# Columns an import file must provide; any `id` column is ignored and new IDs allocated
+IMPORT_COLUMNS = {
+    'sales': ['product_id', 'quantity', 'price', 'date'],
+    'expenses': ['description', 'amount', 'date']
+}
+
+
+@dataclass
+class ImportReport:
+    """Outcome of a bulk import"""
+    table: str
+    rows_read: int = 0
+    rows_imported: int = 0
+    rows_rejected: int = 0
+    seconds: float = 0.0
+    rejected: list = field(default_factory=list)
+
+    def add_chunk(self, rows_read: int, rows_imported: int, rejected: pd.DataFrame) -> None:
+        self.rows_read += rows_read
+        self.rows_imported += rows_imported
+        self.rows_rejected += len(rejected)
+        if not rejected.empty:
+            self.rejected.append(rejected)
+
+    def rejected_rows(self) -> pd.DataFrame:
+        """Every rejected input row, with its line number and the reason"""
+        return pd.concat(self.rejected, ignore_index=True) if self.rejected else pd.DataFrame()
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_read / self.seconds if self.seconds > 0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.table}: imported {self.rows_imported:,} of {self.rows_read:,} rows "
+            f"in {self.seconds:.2f}s ({self.rows_per_second:,.0f} rows/sec), "
+            f"rejected {self.rows_rejected:,}"
+        )
+
+
+def read_chunks(path: str, table: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    """Stream an import file as text chunks, checking its header first"""
+    reader = pd.read_csv(path, dtype=str, chunksize=chunksize, keep_default_na=False)
+    for chunk in reader:
+        missing = [c for c in IMPORT_COLUMNS[table] if c not in chunk.columns]
+        if missing:
+            raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+        yield chunk
+
+
+def _split(chunk: pd.DataFrame, columns: dict, checks: list) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Apply (failed_mask, reason) checks; the first failing check names the rejection"""
+    reasons = np.select([failed for failed, _ in checks], [reason for _, reason in checks], default='')
+    ok = reasons == ''
+
+    valid = pd.DataFrame({name: values[ok] for name, values in columns.items()})
+    rejected = chunk[~ok].assign(line=chunk.index[~ok] + 2, reason=reasons[~ok])
+    return valid.reset_index(drop=True), rejected
+
+
+def validate_sales(chunk: pd.DataFrame, product_ids) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Parse a chunk of sales, rejecting rows with unknown products or bad values"""
+    product_id = pd.to_numeric(chunk['product_id'], errors='coerce')
+    quantity = pd.to_numeric(chunk['quantity'], errors='coerce')
+    price = pd.to_numeric(chunk['price'], errors='coerce')
+    day = pd.to_datetime(chunk['date'], format=DATE_FORMAT, errors='coerce')
+
+    return _split(chunk, {
+        'product_id': product_id.fillna(0).astype('int32'),
+        'quantity': quantity.fillna(0).astype('int32'),
+        'price': price.astype(float),
+        'date': day
+    }, [
+        (product_id.isna(), 'invalid product_id'),
+        (~product_id.isin(list(product_ids)), 'unknown product_id'),
+        (quantity.isna() | (quantity < 1) | (quantity % 1 != 0), 'invalid quantity'),
+        (price.isna() | (price < 0), 'invalid price'),
+        (day.isna(), 'invalid date')
+    ])
+
+
+def validate_expenses(chunk: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Parse a chunk of expenses, rejecting rows with bad values"""
+    description = chunk['description'].str.strip()
+    amount = pd.to_numeric(chunk['amount'], errors='coerce')
+    day = pd.to_datetime(chunk['date'], format=DATE_FORMAT, errors='coerce')
+
+    return _split(chunk, {
+        'description': description,
+        'amount': amount.astype(float),
+        'date': day
+    }, [
+        (description == '', 'missing description'),
+        (amount.isna() | (amount < 0), 'invalid amount'),
+        (day.isna(), 'invalid date')
+    ])
+
+
+def main():
+    from utils.data_manager import DataManager
+
+    parser = argparse.ArgumentParser(description="Bulk import historical sales or expenses from a CSV file")
+    parser.add_argument('table', choices=sorted(IMPORT_COLUMNS))
+    parser.add_argument('path', help="CSV file with columns: " + "; ".join(
+        f"{table}: {', '.join(columns)}" for table, columns in IMPORT_COLUMNS.items()
+    ))
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--chunksize', type=int, default=50_000)
+    parser.add_argument('--rejects', help="Write rejected rows, with line numbers and reasons, to this CSV")
+    args = parser.parse_args()
+
+    data_manager = DataManager(args.data_dir)
+    if args.table == 'sales':
+        report = data_manager.import_sales(args.path, args.chunksize)
+    else:
+        report = data_manager.import_expenses(args.path, args.chunksize)
+
+    print(report.summary())
+    if report.rows_rejected:
+        rejected = report.rejected_rows()
+        if args.rejects:
+            rejected.to_csv(args.rejects, index=False)
+            print(f"Rejected rows written to {args.rejects}")
+        else:
+            print(rejected[['line', 'reason']].groupby('reason').count().rename(columns={'line': 'rows'}))
+
+
+if __name__ == "__main__":
+    main()
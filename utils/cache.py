@@ -0,0 +1,96 @@
+import threading
+from typing import Any, Callable, Hashable, Optional
+
+
+class SharedCache:
+    """Process-wide cache of loaded data, shared by every DataManager.
+
+    Each entry is stored with the fingerprint of the data it was loaded
+    from. A lookup with a different fingerprint reloads the entry, so any
+    number of sessions share one parse and still see writes made by other
+    sessions or processes. Keys are (namespace, name) tuples so all the
+    entries for one data source can be dropped together.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # [hits, misses] per entry name, across namespaces
+        self.stats = {}
+
+    def _key_lock(self, key: Hashable) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, key: Hashable, fingerprint: Hashable, loader: Callable[[], Any],
+            current: Optional[Callable[[], Hashable]] = None) -> Any:
+        """Return the cached value for key, loading it if missing or stale.
+
+        `current` re-reads the fingerprint after a load. If it changed, a
+        write landed while loading and the value may already include it,
+        so it is returned but not cached: stored under the old fingerprint,
+        a later patch for that write would apply it twice.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == fingerprint:
+            self._count(key, hit=True)
+            return entry[1]
+
+        # Sessions that miss at the same time wait for a single load
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == fingerprint:
+                self._count(key, hit=True)
+                return entry[1]
+
+            self._count(key, hit=False)
+            value = loader()
+            if current is None or current() == fingerprint:
+                self._entries[key] = (fingerprint, value)
+            return value
+
+    def put(self, key: Hashable, fingerprint: Hashable, value: Any) -> None:
+        """Store a value obtained without a loader, counting it as a hit"""
+        self._count(key, hit=True)
+        self._entries[key] = (fingerprint, value)
+
+    def _count(self, key: Hashable, hit: bool) -> None:
+        counts = self.stats.setdefault(key[1] if isinstance(key, tuple) else key, [0, 0])
+        if hit:
+            self.hits += 1
+            counts[0] += 1
+        else:
+            self.misses += 1
+            counts[1] += 1
+
+    def patch(self, key: Hashable, before: Hashable, after: Hashable,
+              update: Callable[[Any], Any]) -> None:
+        """Bring a cached value up to date with a write instead of reloading it.
+
+        `before` and `after` are the fingerprints from either side of the
+        write. The entry is only patched if it still matches `before`;
+        otherwise something else changed the data too and it is dropped.
+        """
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            if entry[0] == before:
+                self._entries[key] = (after, update(entry[1]))
+            else:
+                del self._entries[key]
+
+    def invalidate(self, namespace: Hashable = None, names: tuple = ()) -> None:
+        """Drop every entry, or only those in namespace, optionally limited to names"""
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == namespace and (not names or k[1] in names)]:
+                    del self._entries[key]
+
+
+shared_cache = SharedCache()
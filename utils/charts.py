@@ -0,0 +1,64 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from utils.timeseries import PERIODS
+
+# Most points or bars a chart sends to the browser
+MAX_POINTS = 400
+
+# Rough days per bucket, to count buckets without building them
+PERIOD_DAYS = {'day': 1, 'week': 7, 'month': 30.44}
+
+
+def chart_period(start_date: date, end_date: date, period: str = 'day', max_points: int = MAX_POINTS) -> str:
+    """The finest period, no finer than `period`, whose buckets over the range fit in max_points"""
+    days = (end_date - start_date).days + 1
+    periods = list(PERIODS)
+    for candidate in periods[periods.index(period):]:
+        if days / PERIOD_DAYS[candidate] <= max_points:
+            return candidate
+    return periods[-1]
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """Positions of the n points Largest-Triangle-Three-Buckets keeps from (x, y).
+
+    The first and last points are always kept. Between them, each bucket
+    keeps the point forming the largest triangle with the point kept
+    before it and the mean of the next bucket, which preserves peaks and
+    dips that plain decimation would drop.
+    """
+    length = len(x)
+    if n >= length or n < 3:
+        return np.arange(length)
+
+    x = x.astype('float64')
+    y = y.astype('float64')
+    edges = np.linspace(1, length - 1, n - 1).astype(int)
+    kept = np.empty(n, dtype=int)
+    kept[0], kept[-1] = 0, length - 1
+
+    previous = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else length
+        next_x = x[next_lo:next_hi].mean()
+        next_y = y[next_lo:next_hi].mean()
+        areas = np.abs(
+            (x[previous] - next_x) * (y[lo:hi] - y[previous])
+            - (x[previous] - x[lo:hi]) * (next_y - y[previous])
+        )
+        previous = kept[i + 1] = lo + int(areas.argmax())
+    return kept
+
+
+def downsample(df: pd.DataFrame, x: str, y: str, max_points: int = MAX_POINTS) -> pd.DataFrame:
+    """At most max_points rows of df, chosen by LTTB on column y; other columns follow those rows"""
+    if len(df) <= max_points:
+        return df
+    xs = df[x].to_numpy()
+    if np.issubdtype(xs.dtype, np.datetime64):
+        xs = xs.astype('datetime64[ns]').astype('int64')
+    return df.iloc[lttb_indices(xs, df[y].to_numpy(), max_points)].reset_index(drop=True)
@@ -1,133 +1,767 @@
-import pandas as pd
 import os
-from datetime import datetime
+import pandas as pd
+import time
+from datetime import datetime, date
 import numpy as np
-from functools import lru_cache
-from typing import Optional
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from utils.bulk_import import ImportReport, read_chunks, validate_expenses, validate_sales
+from utils.cache import shared_cache
+from utils.export import iter_export
+from utils.metrics import instrumented, timed
+from utils.notifications import daily_summary_text, get_dispatcher, large_sale_text, large_sale_threshold
+from utils.writer import get_write_queue, serialized
+from utils.rollup import CATEGORY_COUNTERS, build_category_rollup, build_derived_tables, sale_deltas
+from utils.search import ProductSearchIndex
+from utils.snapshot import MISSING, get_snapshot_store
+from utils.storage import (
+    BASE_TABLES, SALES_RENAMES, TABLES, Page, StorageBackend, apply_schema, assign_where, filter_frame,
+    get_backend, iso_date, join_sales, page_frame
+)
+
+
+def _sorted_by_date(df: pd.DataFrame) -> pd.DataFrame:
+    """Order rows by their date, which the backend parsed at load"""
+    return df.sort_values('date', kind='stable', ignore_index=True)
+
+
+def _slice_dates(df: pd.DataFrame, start_date: Optional[date], end_date: Optional[date]) -> pd.DataFrame:
+    """Binary-search the rows of a date-sorted frame within [start_date, end_date]"""
+    dates = df['date'].values
+    lo = 0 if start_date is None else dates.searchsorted(np.datetime64(iso_date(start_date)), 'left')
+    hi = len(df) if end_date is None else dates.searchsorted(np.datetime64(iso_date(end_date)), 'right')
+    return df.iloc[lo:hi]
+
+
+def _append_sorted(df: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    """Append rows to a date-sorted frame without recoding its categoricals"""
+    if rows.empty:
+        return df
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            missing = pd.Index(rows[column].astype(object).dropna().unique()).difference(df[column].cat.categories)
+            if len(missing):
+                df = df.assign(**{column: df[column].cat.add_categories(missing)})
+
+    # Matching dtypes column for column keeps concat from inspecting every existing value
+    rows = rows.reindex(columns=df.columns).astype(df.dtypes.to_dict())
+    if df.empty:
+        return _sorted_by_date(rows)
+    combined = pd.concat([df, rows], ignore_index=True)
+    if rows['date'].min() < df['date'].iloc[-1]:
+        combined = _sorted_by_date(combined)
+    return combined
+
+
+def _to_view(sales: pd.DataFrame) -> pd.DataFrame:
+    """Sales table rows in the cached view's form: transaction_id is int32, 0 for none"""
+    return sales.assign(transaction_id=sales['transaction_id'].fillna(0).astype('int32'))
+
+
+def _from_view(rows: pd.DataFrame) -> pd.DataFrame:
+    """Rows of the cached view back in the sales table's form"""
+    transaction_id = rows['transaction_id']
+    return rows.assign(transaction_id=transaction_id.astype('Int32').mask(transaction_id == 0))
+
+
+class SalesView:
+    """The cached, date-sorted sales table: a large base frame plus the sales added since.
+
+    Only the sales table's own columns are kept, all plain numbers and
+    dates (see `_to_view`), so the base maps zero-copy from the shared
+    Arrow file and costs a process nothing as the history grows. Product
+    details are joined onto the rows each read returns.
+
+    Recording a sale only appends to the small tail, so the writer never
+    copies the whole history. Readers get the two joined by `frame`, once
+    per version of the view, or by `slice`, which joins only the dates
+    asked for. The tail is folded into the base once it reaches MERGE_ROWS.
+    """
+
+    MERGE_ROWS = 5_000
+
+    def __init__(self, base: pd.DataFrame, tail: Optional[pd.DataFrame] = None, base_max_id: Optional[int] = None):
+        self.base = base
+        self.tail = base.iloc[:0] if tail is None else tail
+        self._base_max_id = base_max_id
+        self._frame = None
+
+    @classmethod
+    def of(cls, value) -> 'SalesView':
+        """Wrap a frame from a snapshot or the shared mapping; views pass through"""
+        return value if isinstance(value, cls) else cls(value)
+
+    def __len__(self) -> int:
+        return len(self.base) + len(self.tail)
+
+    def __getstate__(self) -> dict:
+        return {'base': self.base, 'tail': self.tail}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state['base'], state['tail'])
+
+    @property
+    def base_max_id(self) -> int:
+        if self._base_max_id is None:
+            self._base_max_id = int(self.base['id'].max()) if len(self.base) else 0
+        return self._base_max_id
+
+    def append(self, rows: pd.DataFrame) -> 'SalesView':
+        """A view with rows added, skipping sales it already has.
+
+        A reload that raced the write may already hold the sale. IDs only
+        grow, so only rows at or below the base's highest ID are looked up in it.
+        """
+        rows = rows[~rows['id'].isin(self.tail['id'])]
+        known = rows['id'] <= self.base_max_id
+        if known.any():
+            rows = rows[~(known & rows['id'].isin(self.base['id']))]
+        if rows.empty:
+            return self
+
+        view = SalesView(self.base, _append_sorted(self.tail, rows), self.base_max_id)
+        if len(view.tail) >= self.MERGE_ROWS:
+            view = SalesView(view.frame())
+        return view
+
+    def apply_log(self, entries: list) -> 'SalesView':
+        """A view with log entries of the sales table replayed on it, in order"""
+        view = self
+        for entry in entries:
+            if entry['op'] == 'insert':
+                rows = apply_schema(pd.DataFrame(entry['rows'], columns=TABLES['sales']), 'sales')
+                view = view.append(_to_view(rows))
+            elif entry['op'] == 'delete':
+                view = view.map(lambda df, row_id=entry['id']: df[df['id'] != row_id].reset_index(drop=True))
+            else:
+                view = view.map(lambda df, entry=entry: assign_where(
+                    df.copy(), df['id'] == entry['id'], entry['changes']
+                ))
+        return view
+
+    def where(self, column: str, value) -> pd.DataFrame:
+        """Rows whose column equals value, filtered before base and tail are joined"""
+        return _append_sorted(self.base[self.base[column] == value], self.tail[self.tail[column] == value])
+
+    def map(self, update) -> 'SalesView':
+        """A view with update applied to the base and the tail, for rare edits and deletes"""
+        return SalesView(update(self.base), update(self.tail))
+
+    def frame(self) -> pd.DataFrame:
+        """The whole history as one date-sorted frame"""
+        if self._frame is None:
+            self._frame = _append_sorted(self.base, self.tail)
+        return self._frame
+
+    def slice(self, start_date: Optional[date], end_date: Optional[date]) -> pd.DataFrame:
+        """Rows within [start_date, end_date], joining only that range of base and tail"""
+        if self._frame is not None or (start_date is None and end_date is None):
+            return _slice_dates(self.frame(), start_date, end_date)
+        return _append_sorted(_slice_dates(self.base, start_date, end_date),
+                              _slice_dates(self.tail, start_date, end_date))
+
+
+class ProductRecord(NamedTuple):
+    name: str
+    price: float
+    category: str
+
+
+class ProductSales(NamedTuple):
+    sale_count: int
+    quantity: int
+    last_sold: Optional[pd.Timestamp]
+
+
+# Cache keys of the data sources this process has already recovered
+_recovered = set()
+
 
 class DataManager:
-    def __init__(self):
-        self.data_dir = "data"
+    """Reads and writes the shop's data through a storage backend.
+
+    Frames returned by the getters come from the process-wide cache and
+    share their buffers with it. The app enables pandas copy-on-write in
+    main.py, so an in-place edit by a page only changes the page's copy;
+    other callers must not edit them in place. Code here that changes
+    cached data makes its own copy first, as the cache patches do.
+    """
+
+    # Cached data that changes whenever a sale is added or removed
+    SALE_DERIVED = ('daily_rollup', 'daily_category_rollup', 'product_sales', 'product_sales_index')
+    # Cached history published as memory-mapped Arrow files, so server processes share one copy
+    SHARED = ('sales', 'expenses')
+
+    def __init__(self, data_dir: str = "data", backend: Optional[StorageBackend] = None):
+        self.data_dir = data_dir
+        self.backend = backend or get_backend(data_dir)
+        self._writer = get_write_queue(self.backend.lock_path)
+        self._writer.on_interrupted = self._repair_interrupted_write
+        snapshot_dir = os.path.join(data_dir, '.snapshot', type(self.backend).__name__.lower())
+        self._snapshots = get_snapshot_store(snapshot_dir)
+        try:
+            self._shared = get_snapshot_store(snapshot_dir, shared=True)
+        except ImportError:
+            self._shared = None
+        self._notifier = get_dispatcher()
+        self._large_sale = large_sale_threshold()
         self.ensure_data_files()
         self._cache_timestamp = datetime.now()
 
+    @serialized
     def ensure_data_files(self):
-        """Create data files if they don't exist"""
-        if not os.path.exists(self.data_dir):
-            os.makedirs(self.data_dir)
-
-        files = {
-            'products.csv': ['id', 'name', 'category', 'price', 'created_at', 'notes'],
-            'sales.csv': ['id', 'product_id', 'quantity', 'price', 'date'],
-            'expenses.csv': ['id', 'description', 'amount', 'date']
-        }
+        """Create data files if they don't exist and, once per process, repair writes a crash interrupted"""
+        created = self.backend.ensure_tables()
+        # Every session builds a DataManager; only the first in the process recovers
+        if self.backend.cache_key not in _recovered:
+            _recovered.add(self.backend.cache_key)
+            if self.backend.recover():
+                self._invalidate_cache()
+        if any(table not in BASE_TABLES for table in created):
+            self.rebuild_rollups()
+
+    def _repair_interrupted_write(self) -> None:
+        """Re-derive what a writer that died mid-write may have left inconsistent.
+
+        Transaction headers are recomputed from their sale lines, dropping
+        any whose lines were never written, then the rollups are rebuilt.
+        """
+        sales = self.backend.read_table('sales').dropna(subset=['transaction_id'])
+        lines = sales.groupby('transaction_id').agg(item_count=('id', 'count'), total=('price', 'sum'))
+        transactions = self.backend.read_table('transactions')
+        transactions = transactions[transactions['id'].isin(lines.index)]
+        self.backend.write_table('transactions', apply_schema(transactions.assign(
+            item_count=transactions['id'].map(lines['item_count']),
+            total=transactions['id'].map(lines['total'])
+        ), 'transactions'))
+        self.rebuild_rollups()
+
+    @instrumented
+    @serialized
+    def rebuild_rollups(self):
+        """Recompute the daily rollups and product sales index from the full history"""
+        derived = build_derived_tables(self.backend.query_sales(), self.backend.read_table('expenses'))
+        for table, df in derived.items():
+            self.backend.write_table(table, df)
+        self._invalidate_cache()
+
+    def _remove_sale_from_rollups(self, sale: dict, category: str) -> None:
+        """Take a removed sale out of the rollups; new sales go through `_commit_sales`"""
+        deltas = sale_deltas(sale, -1)
+        day = iso_date(pd.Timestamp(sale['date']))
+        product_id = int(sale['product_id'])
+        self.backend.increment('daily_rollup', {'date': day}, deltas)
+        self.backend.increment('daily_category_rollup', {'date': day, 'category': category}, deltas)
+
+        product_deltas = {'sale_count': deltas['sale_count'], 'quantity': deltas['quantity']}
+        last_sold = self._latest_sale_date(product_id)
+        self.backend.increment('product_sales', {'product_id': product_id}, product_deltas, {'last_sold': last_sold})
+
+    def _cached(self, name: str, tables: tuple, loader, catch_up=None):
+        """Load through the process-wide cache, keyed by the tables' fingerprint.
+
+        A miss is served from the on-disk snapshot when it was made from
+        the same data, so a freshly started process skips parsing. Shared
+        data is checked against its published Arrow file on every call,
+        so a private copy is swapped for the mapping once it is published.
+        Otherwise `catch_up(fingerprint, value)` may bring an older
+        snapshot up to date, returning MISSING if it can't.
+        """
+        def current() -> tuple:
+            return self.backend.fingerprint(*tables)
+
+        fingerprint = current()
+        key = (self.backend.cache_key, name)
+        store = self._snapshot_store(name)
+        if store is self._shared:
+            mapped = store.load(name, fingerprint)
+            if mapped is not MISSING:
+                shared_cache.put(key, fingerprint, mapped)
+                return mapped
+
+        def timed_loader():
+            value = store.load(name, fingerprint)
+            if value is not MISSING:
+                return value
+            if catch_up is not None:
+                # Another process wrote since the last snapshot: replay its writes instead of parsing
+                latest = store.latest(name)
+                value = catch_up(*latest) if latest is not MISSING else MISSING
+                if value is not MISSING:
+                    return value
+            with timed(f"load.{name}") as span:
+                value = loader()
+                span.rows = len(value)
+            if current() == fingerprint:
+                store.save(name, fingerprint, value)
+            return value
+
+        return shared_cache.get(key, fingerprint, timed_loader, current)
 
-        for file, columns in files.items():
-            path = os.path.join(self.data_dir, file)
-            if not os.path.exists(path):
-                pd.DataFrame(columns=columns).to_csv(path, index=False)
+    def _snapshot_store(self, name: str):
+        return self._shared if self._shared is not None and name in self.SHARED else self._snapshots
 
-    def _invalidate_cache(self):
-        """Invalidate all cached data"""
+    def _invalidate_cache(self, *names: str):
+        """Invalidate the named cached data, or all of it"""
         self._cache_timestamp = datetime.now()
-        self.get_products.cache_clear()
-        self.get_sales_data.cache_clear()
-        self.get_expenses.cache_clear()
+        shared_cache.invalidate(self.backend.cache_key, names)
 
+    def _sales_data_fingerprint(self) -> tuple:
+        return self.backend.fingerprint('sales')
+
+    def _patch_cached(self, name: str, tables: tuple, before: tuple, update=None) -> None:
+        """Carry cached data, and its snapshot, across a write to tables made since `before`"""
+        after = self.backend.fingerprint(*tables)
+
+        def patch_and_snapshot(value):
+            value = update(value) if update is not None else value
+            self._snapshot_store(name).save(name, after, value)
+            return value
+
+        shared_cache.patch((self.backend.cache_key, name), before, after, patch_and_snapshot)
+
+    def _patch_sales_data(self, before: tuple, update=None) -> None:
+        """Carry the cached sales view across a write made since `before`"""
+        self._patch_cached('sales', ('sales',), before, update)
+
+    def _patch_search_index(self, before: tuple, product_id: int, product: Optional[dict]) -> None:
+        """Re-index one product in the cached search index, or drop it when product is None"""
+        def update(index: ProductSearchIndex) -> ProductSearchIndex:
+            if product is None:
+                index.remove(product_id)
+            else:
+                index.add(product_id, product['name'], product['category'], product['notes'])
+            return index
+
+        self._patch_cached('product_search', ('products',), before, update)
+
+    @instrumented
+    @serialized
     def add_product(self, name: str, category: str, price: float, notes: str = "") -> int:
         """Add a new product with improved ID handling"""
-        df = pd.read_csv(f"{self.data_dir}/products.csv")
-        new_id = 1 if df.empty else df['id'].max() + 1
-
-        new_product = pd.DataFrame({
-            'id': [new_id],
-            'name': [name],
-            'category': [category],
-            'price': [price],
-            'created_at': [datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
-            'notes': [notes]
-        })
-
-        df = pd.concat([df, new_product], ignore_index=True)
-        df.to_csv(f"{self.data_dir}/products.csv", index=False)
-        self._invalidate_cache()
+        before_products = self.backend.fingerprint('products')
+        product = {
+            'name': name,
+            'category': category,
+            'price': float(price),
+            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'notes': notes
+        }
+        new_id = self.backend.insert('products', product)
+        self._patch_search_index(before_products, new_id, product)
+        self._invalidate_cache('products', 'product_index')
         return new_id
 
+    @instrumented
+    @serialized
+    def update_product(self, product_id: int, name: Optional[str] = None, category: Optional[str] = None,
+                       price: Optional[float] = None, notes: Optional[str] = None) -> None:
+        """Change some details of a product; sales pick them up as they are joined on read"""
+        changes = {
+            column: value
+            for column, value in [('name', name), ('category', category), ('price', price), ('notes', notes)]
+            if value is not None
+        }
+        if not changes:
+            return
+        if 'price' in changes:
+            changes['price'] = float(changes['price'])
+
+        old_category = self._product_category(product_id)
+        if changes.get('category', old_category) != old_category:
+            self._move_category_rollups(self._product_sales_rows(product_id), old_category, changes['category'])
+
+        products = self.get_products()
+        current = products[products['id'] == product_id]
+        product = {**current.iloc[0].to_dict(), **changes} if not current.empty else None
+
+        before_products = self.backend.fingerprint('products')
+        self.backend.update('products', product_id, changes)
+        self._patch_search_index(before_products, product_id, product)
+        self._invalidate_cache('products', 'product_index', 'daily_category_rollup')
+
+    def _product_sales_rows(self, product_id: int) -> pd.DataFrame:
+        """One product's joined sales, through the backend's index or filtered from the cached view"""
+        if self.backend.indexed:
+            return self.backend.query_product_sales(product_id)
+        return self._join_products(self._get_all_sales_data().where('product_id', product_id))
+
+    def _move_category_rollups(self, product_sales: pd.DataFrame, old_category: str, new_category: str) -> None:
+        """Re-attribute a product's sales in the category rollup after its category changes, in one write"""
+        moved = build_category_rollup(product_sales.assign(category=new_category))
+        removed = moved.assign(category=old_category, **{column: -moved[column] for column in CATEGORY_COUNTERS})
+        self.backend.increment_many('daily_category_rollup', pd.concat([removed, moved], ignore_index=True))
+
+    @instrumented
+    @serialized
     def remove_product(self, product_id: int) -> bool:
         """Remove a product if it has no associated sales"""
-        sales_df = pd.read_csv(f"{self.data_dir}/sales.csv")
-
-        if not sales_df.empty and product_id in sales_df['product_id'].values:
+        product_sales = self._get_product_sales_index().get(int(product_id))
+        if product_sales is not None and product_sales.sale_count > 0:
             return False
 
-        products_df = pd.read_csv(f"{self.data_dir}/products.csv")
-        products_df = products_df[products_df['id'] != product_id]
-        products_df.to_csv(f"{self.data_dir}/products.csv", index=False)
-        self._invalidate_cache()
+        before_products = self.backend.fingerprint('products')
+        self.backend.delete('products', product_id)
+        self._patch_search_index(before_products, product_id, None)
+        self._invalidate_cache('products', 'product_index')
         return True
 
-    @lru_cache(maxsize=1)
+    @instrumented
     def get_products(self) -> pd.DataFrame:
         """Get products with proper data types and caching"""
-        df = pd.read_csv(f"{self.data_dir}/products.csv")
-        if not df.empty:
-            df['id'] = df['id'].astype(int)
-            df['price'] = df['price'].astype(float)
-            df['created_at'] = pd.to_datetime(df['created_at'])
-        return df
+        return self._cached('products', ('products',), lambda: self.backend.read_table('products'))
+
+    @instrumented
+    def get_product_index(self) -> Dict[int, ProductRecord]:
+        """Product records keyed by ID, rebuilt only when the products change"""
+        return self._cached('product_index', ('products',), self._build_product_index)
+
+    def _build_product_index(self) -> Dict[int, ProductRecord]:
+        products = self.get_products()
+        return {
+            int(product_id): ProductRecord(name, float(price), category)
+            for product_id, name, price, category in zip(
+                products['id'], products['name'], products['price'], products['category']
+            )
+        }
 
+    def get_product_search_index(self) -> ProductSearchIndex:
+        """Search index over product name, category and notes, patched by product writes"""
+        return self._cached('product_search', ('products',), lambda: ProductSearchIndex.build(
+            *(self.get_products()[column] for column in ('id', 'name', 'category', 'notes'))
+        ))
+
+    @instrumented
+    def search_products(self, query: str, rank_by_sales: bool = False) -> List[int]:
+        """IDs of products whose name, category or notes contain every word of query.
+
+        With rank_by_sales, the products sold most often come first.
+        """
+        rank = None
+        if rank_by_sales:
+            rank = {product_id: sales.sale_count for product_id, sales in self._get_product_sales_index().items()}
+        return self.get_product_search_index().search(query, rank)
+
+    @instrumented
+    def get_product_sales(self) -> pd.DataFrame:
+        """Sale count, quantity sold and last sale date per product"""
+        return self._cached('product_sales', ('product_sales',), lambda: self.backend.read_table('product_sales'))
+
+    def _get_product_sales_index(self) -> Dict[int, ProductSales]:
+        return self._cached('product_sales_index', ('product_sales',), lambda: {
+            int(row.product_id): ProductSales(int(row.sale_count), int(row.quantity), row.last_sold)
+            for row in self.get_product_sales().itertuples(index=False)
+        })
+
+    def _latest_sale_date(self, product_id: int) -> Optional[str]:
+        """A product's latest sale date, through the backend's index or from the cached view"""
+        if self.backend.indexed:
+            return self.backend.latest_date('sales', 'product_id', product_id)
+        dates = self._get_all_sales_data().where('product_id', product_id)['date']
+        return iso_date(dates.max()) if not dates.empty else None
+
+    def _sale_row(self, sale_id: int) -> Optional[dict]:
+        """A sale as stored, through the backend's index or from the cached view"""
+        if self.backend.indexed:
+            return self.backend.get_row('sales', sale_id)
+        rows = _from_view(self._get_all_sales_data().where('id', sale_id))
+        return rows.iloc[0].to_dict() if not rows.empty else None
+
+    def _product_category(self, product_id: int) -> str:
+        product = self.get_product_index().get(int(product_id))
+        return product.category if product is not None else 'Unknown'
+
+    def _product_name(self, product_id: int) -> str:
+        product = self.get_product_index().get(int(product_id))
+        return product.name if product is not None else 'Unknown'
+
+    def _alert_large_sale(self, total: float, items: List[str]) -> None:
+        # Only queues the SMS; sending happens on the notifier's thread
+        if self._notifier is not None and self._large_sale is not None and total >= self._large_sale:
+            self._notifier.notify(large_sale_text(total, items))
+
+    def send_daily_summary(self, day: Optional[date] = None) -> bool:
+        """Queue the end-of-day revenue summary SMS; False if notifications are off or the queue is full"""
+        if self._notifier is None:
+            return False
+        day = day or datetime.now().date()
+        return self._notifier.notify(daily_summary_text(self.get_daily_summary(day, day), day))
+
+    @instrumented
+    @serialized
     def add_sale(self, product_id: int, quantity: int, price: float) -> int:
         """Add a new sale record"""
-        df = pd.read_csv(f"{self.data_dir}/sales.csv")
-        new_id = len(df) + 1 if df.empty else df['id'].max() + 1
-        new_sale = pd.DataFrame({
-            'id': [new_id],
-            'product_id': [product_id],
-            'quantity': [quantity],
-            'price': [price],
-            'date': [datetime.now().strftime('%Y-%m-%d')]
+        before = self._sales_data_fingerprint()
+        sale = self._commit_sales(pd.DataFrame([{
+            'product_id': int(product_id),
+            'quantity': int(quantity),
+            'price': float(price),
+            'date': datetime.now().strftime('%Y-%m-%d')
+        }]))
+        self._patch_sales_data(before, lambda view: SalesView.of(view).append(_to_view(sale)))
+        self._invalidate_cache(*self.SALE_DERIVED)
+        self._alert_large_sale(float(price), [f"{quantity} x {self._product_name(product_id)}"])
+        return int(sale['id'].iloc[0])
+
+    @instrumented
+    @serialized
+    def add_transaction(self, items: List[Tuple[int, int, float]]) -> Tuple[int, List[int]]:
+        """Record several (product_id, quantity, price) line items as one transaction.
+
+        The header and lines are written together and caches are updated once. Returns
+        the transaction ID and the sale IDs of its lines.
+        """
+        if not items:
+            raise ValueError("A transaction needs at least one item")
+        lines = pd.DataFrame(items, columns=['product_id', 'quantity', 'price'])
+        unknown = set(lines['product_id']) - set(self.get_product_index())
+        if unknown:
+            raise ValueError(f"Unknown product IDs: {sorted(unknown)}")
+
+        today = datetime.now().strftime('%Y-%m-%d')
+        before = self._sales_data_fingerprint()
+        sales = self._commit_sales(lines.assign(date=today), transaction={
+            'date': today,
+            'item_count': len(lines),
+            'total': float(lines['price'].sum())
         })
-        df = pd.concat([df, new_sale], ignore_index=True)
-        df.to_csv(f"{self.data_dir}/sales.csv", index=False)
-        self._invalidate_cache()
-        return new_id
+        transaction_id = int(sales['transaction_id'].iloc[0])
+        self._patch_sales_data(before, lambda view: SalesView.of(view).append(_to_view(sales)))
+        self._invalidate_cache(*self.SALE_DERIVED)
+        self._alert_large_sale(
+            float(lines['price'].sum()),
+            [f"{quantity} x {self._product_name(product_id)}"
+             for quantity, product_id in zip(sales['quantity'], sales['product_id'])]
+        )
+        return transaction_id, sales['id'].tolist()
+
+    def _commit_sales(self, rows: pd.DataFrame, transaction: Optional[dict] = None) -> pd.DataFrame:
+        """Write a batch of sales and their rollup deltas; returns the sales as stored, with their IDs.
+
+        With `transaction`, its header is written with the sales in one backend write.
+        """
+        if transaction is None:
+            ids = self.backend.insert_many('sales', rows)
+        else:
+            transaction_id, ids = self.backend.insert_transaction(transaction, rows)
+            rows = rows.assign(transaction_id=transaction_id)
+        rows = apply_schema(rows.assign(id=list(ids)).reindex(columns=TABLES['sales']), 'sales')
+        joined = join_sales(rows, self.get_products())
 
+        for derived_table, deltas in build_derived_tables(joined, None).items():
+            self.backend.increment_many(derived_table, deltas, maxima=('last_sold',))
+        return rows
+
+    @instrumented
+    @serialized
     def remove_sale(self, sale_id: int) -> None:
         """Remove a sale record by its ID"""
-        df = pd.read_csv(f"{self.data_dir}/sales.csv")
-        df = df[df['id'] != sale_id]
-        df.to_csv(f"{self.data_dir}/sales.csv", index=False)
-        self._invalidate_cache()
+        sale = self._sale_row(sale_id)
+        if sale is None:
+            return
+
+        before = self._sales_data_fingerprint()
+        self.backend.delete('sales', sale_id)
+        # Patched first, so the rollups below read the product's remaining sales from the view
+        self._patch_sales_data(
+            before,
+            lambda view: SalesView.of(view).map(lambda df: df[df['id'] != sale_id].reset_index(drop=True))
+        )
+        self._remove_sale_from_rollups(sale, self._product_category(sale['product_id']))
+        if pd.notna(sale.get('transaction_id')):
+            self._remove_from_transaction(int(sale['transaction_id']), float(sale['price']))
+        self._invalidate_cache(*self.SALE_DERIVED)
+
+    def _remove_from_transaction(self, transaction_id: int, price: float) -> None:
+        transaction = self.backend.get_row('transactions', transaction_id)
+        if transaction is None:
+            return
+        if transaction['item_count'] <= 1:
+            self.backend.delete('transactions', transaction_id)
+        else:
+            self.backend.update('transactions', transaction_id, {
+                'item_count': int(transaction['item_count']) - 1,
+                'total': float(transaction['total']) - price
+            })
 
+    @instrumented
+    @serialized
     def add_expense(self, description: str, amount: float) -> None:
         """Add a new expense record"""
-        df = pd.read_csv(f"{self.data_dir}/expenses.csv")
-        new_id = len(df) + 1 if df.empty else df['id'].max() + 1
-        new_expense = pd.DataFrame({
-            'id': [new_id],
-            'description': [description],
-            'amount': [amount],
-            'date': [datetime.now().strftime('%Y-%m-%d')]
-        })
-        df = pd.concat([df, new_expense], ignore_index=True)
-        df.to_csv(f"{self.data_dir}/expenses.csv", index=False)
+        expense = {
+            'description': description,
+            'amount': float(amount),
+            'date': datetime.now().strftime('%Y-%m-%d')
+        }
+        self.backend.insert('expenses', expense)
+        self.backend.increment('daily_rollup', {'date': expense['date']}, {'expenses': expense['amount']})
+        self._invalidate_cache('expenses', 'daily_rollup')
+
+    @instrumented
+    def import_sales(self, path: str, chunksize: int = 50_000) -> ImportReport:
+        """Stream historical sales from a CSV file, committing one write per chunk"""
+        return self._import('sales', path, chunksize)
+
+    @instrumented
+    def import_expenses(self, path: str, chunksize: int = 50_000) -> ImportReport:
+        """Stream historical expenses from a CSV file, committing one write per chunk"""
+        return self._import('expenses', path, chunksize)
+
+    def _import(self, table: str, path: str, chunksize: int) -> ImportReport:
+        report = ImportReport(table)
+        started = time.perf_counter()
+        for chunk in read_chunks(path, table, chunksize):
+            if table == 'sales':
+                valid, rejected = validate_sales(chunk, self.get_product_index().keys())
+            else:
+                valid, rejected = validate_expenses(chunk)
+
+            if not valid.empty:
+                # Each chunk is its own write so clerks' sales can interleave with a long import
+                self._writer.run(lambda: self._commit_import_chunk(table, valid))
+            report.add_chunk(len(chunk), len(valid), rejected)
+
         self._invalidate_cache()
+        report.seconds = time.perf_counter() - started
+        return report
+
+    def _commit_import_chunk(self, table: str, rows: pd.DataFrame) -> None:
+        if table == 'sales':
+            self._commit_sales(rows)
+            return
+
+        ids = self.backend.insert_many('expenses', rows)
+        rows = apply_schema(rows.assign(id=list(ids)), 'expenses')
+        for derived_table, deltas in build_derived_tables(None, rows).items():
+            self.backend.increment_many(derived_table, deltas)
+
+    def _get_all_sales_data(self) -> SalesView:
+        return SalesView.of(self._cached(
+            'sales', ('sales',),
+            lambda: SalesView(_to_view(_sorted_by_date(self.backend.read_table('sales')))),
+            catch_up=self._catch_up_sales
+        ))
+
+    def _catch_up_sales(self, fingerprint, view) -> SalesView:
+        entries = self.backend.log_since('sales', fingerprint[0])
+        return MISSING if entries is None else SalesView.of(view).apply_log(entries)
+
+    def _join_products(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """Rows of the cached sales view with their product details"""
+        return join_sales(_from_view(rows), self.get_products())
+
+    def _get_all_expenses(self) -> pd.DataFrame:
+        return self._cached('expenses', ('expenses',), lambda: _sorted_by_date(self.backend.read_table('expenses')))
+
+    @instrumented
+    def get_sales_data(self, start_date: Optional[date] = None, end_date: Optional[date] = None) -> pd.DataFrame:
+        """Get sales data with product details, optionally limited to a date range.
+
+        Backends indexing sales by date answer range queries directly;
+        otherwise the cached, date-sorted history is sliced by binary search.
+        Either way `date` is a datetime column. A cached result shares the cache's buffers: see
+        the class docstring on editing it.
+        """
+        if self.backend.indexes('sales') and (start_date or end_date):
+            return _sorted_by_date(self.backend.query_sales(start_date, end_date))
+        return self._join_products(self._get_all_sales_data().slice(start_date, end_date))
+
+    @instrumented
+    def get_sales_page(self, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                       offset: int = 0, limit: int = 50, sort: str = 'date', descending: bool = True,
+                       filters: Optional[dict] = None) -> Page:
+        """One page of sales with product details, so pages render the same few rows at any history size.
+
+        `sort` and the keys of `filters` are columns of the sales view;
+        a filter value matches by equality, or membership for a list.
+        Indexed backends read only the page; otherwise the cached view is
+        sliced, which needs no sort when ordering by date, and unless
+        products' columns are involved only the page's rows are joined.
+        """
+        if self.backend.indexed:
+            return self.backend.query_sales_page(start_date, end_date, offset, limit, sort, descending, filters)
+        rows = self._get_all_sales_data().slice(start_date, end_date)
+        filters = filters or {}
+        if {'name', 'category'} & {sort, *filters}:
+            return page_frame(filter_frame(self._join_products(rows), filters), offset, limit, sort, descending)
+
+        table_columns = {renamed: column for column, renamed in SALES_RENAMES.items()}
+        page = page_frame(
+            filter_frame(_from_view(rows), {table_columns.get(c, c): value for c, value in filters.items()}),
+            offset, limit, table_columns.get(sort, sort), descending
+        )
+        return page._replace(rows=join_sales(page.rows, self.get_products()))
+
+    @instrumented
+    def get_products_page(self, offset: int = 0, limit: int = 50, sort: str = 'id', descending: bool = False,
+                          search: Optional[str] = None, categories: Optional[List[str]] = None) -> Page:
+        """One page of the catalog with each product's sale count and last sale date.
+
+        `search` is answered by the product search index. Sales figures
+        are joined onto the page's rows only, unless sorting by them.
+        """
+        products = self.get_products()
+        if search:
+            products = products[products['id'].isin(self.search_products(search))]
+        if categories:
+            products = filter_frame(products, {'category': list(categories)})
+
+        if sort in ('sale_count', 'last_sold'):
+            products = self._with_product_sales(products)
+        page = page_frame(products, offset, limit, sort, descending)
+        if sort not in ('sale_count', 'last_sold'):
+            page = page._replace(rows=self._with_product_sales(page.rows))
+        return page
+
+    def _with_product_sales(self, products: pd.DataFrame) -> pd.DataFrame:
+        product_sales = self.get_product_sales().set_index('product_id')
+        return products.assign(
+            sale_count=products['id'].map(product_sales['sale_count']).fillna(0).astype(int),
+            last_sold=products['id'].map(product_sales['last_sold'])
+        )
+
+    def export_sales(self, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                     fmt: str = 'csv', chunksize: int = 50_000) -> Iterator[bytes]:
+        """Stream sales within a date range as CSV or Parquet bytes, a chunk at a time.
 
-    @lru_cache(maxsize=1)
-    def get_sales_data(self) -> pd.DataFrame:
-        """Get sales data with product details and caching"""
-        sales = pd.read_csv(f"{self.data_dir}/sales.csv")
-        products = pd.read_csv(f"{self.data_dir}/products.csv")
+        Backends indexing sales by date read the range a chunk at a time;
+        otherwise the range is sliced from the cached history, which copies
+        it while the view has a tail (see SalesView), and each chunk is
+        joined with its product details as it is written.
+        """
+        if self.backend.indexes('sales'):
+            chunks = self.backend.iter_sales(start_date, end_date, chunksize)
+        else:
+            rows = self._get_all_sales_data().slice(start_date, end_date)
+            chunks = (self._join_products(rows.iloc[offset:offset + chunksize])
+                      for offset in range(0, len(rows), chunksize))
+        return iter_export(chunks, fmt)
 
-        # Rename columns to avoid confusion after merge
-        sales = sales.rename(columns={'price': 'sale_price', 'id': 'sale_id'})
-        products = products.rename(columns={'price': 'product_price', 'id': 'product_id'})
+    @instrumented
+    def get_expenses(self, start_date: Optional[date] = None, end_date: Optional[date] = None) -> pd.DataFrame:
+        """Get expenses data, optionally limited to a date range"""
+        if self.backend.indexes('expenses') and (start_date or end_date):
+            return _sorted_by_date(self.backend.read_range('expenses', start_date, end_date))
+        return _slice_dates(self._get_all_expenses(), start_date, end_date)
 
-        # Merge sales and products data
-        merged_data = pd.merge(sales, products, on='product_id')
-        return merged_data
+    @instrumented
+    def get_daily_summary(self, start_date: Optional[date] = None, end_date: Optional[date] = None) -> pd.DataFrame:
+        """Per-day revenue, quantity, sale count and expenses from the rollup table"""
+        if self.backend.indexes('daily_rollup') and (start_date or end_date):
+            return _sorted_by_date(self.backend.read_range('daily_rollup', start_date, end_date))
+        daily = self._cached(
+            'daily_rollup', ('daily_rollup',),
+            lambda: _sorted_by_date(self.backend.read_table('daily_rollup'))
+        )
+        return _slice_dates(daily, start_date, end_date)
 
-    @lru_cache(maxsize=1)
-    def get_expenses(self) -> pd.DataFrame:
-        """Get expenses data with caching"""
-        return pd.read_csv(f"{self.data_dir}/expenses.csv")
\ No newline at end of file
+    @instrumented
+    def get_category_summary(self, start_date: Optional[date] = None, end_date: Optional[date] = None) -> pd.DataFrame:
+        """Per-day, per-category revenue, quantity and sale count from the rollup table"""
+        if self.backend.indexes('daily_category_rollup') and (start_date or end_date):
+            return _sorted_by_date(self.backend.read_range('daily_category_rollup', start_date, end_date))
+        by_category = self._cached(
+            'daily_category_rollup', ('daily_category_rollup',),
+            lambda: _sorted_by_date(self.backend.read_table('daily_category_rollup'))
+        )
+        return _slice_dates(by_category, start_date, end_date)
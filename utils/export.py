@@ -0,0 +1,103 @@
+from typing import Iterable, Iterator
+
+import pandas as pd
+
+from utils.storage import DATE_FORMAT
+
+# Columns written to a sales export, in order
+EXPORT_COLUMNS = ['sale_id', 'date', 'transaction_id', 'product_id', 'name', 'category', 'quantity', 'sale_price']
+
+# MIME type of each export format
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+
+def iter_csv(chunks: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """Encode frames as one CSV document, yielding each chunk's bytes as it is ready"""
+    header = True
+    for chunk in chunks:
+        yield chunk.reindex(columns=EXPORT_COLUMNS).to_csv(
+            index=False, header=header, date_format=DATE_FORMAT, lineterminator='\n'
+        ).encode()
+        header = False
+    if header:
+        yield (','.join(EXPORT_COLUMNS) + '\n').encode()
+
+
+class _DrainingSink:
+    """A write-only file whose contents are handed off and dropped as they arrive.
+
+    ParquetWriter asks for the current position to lay out its footer, so
+    the position keeps counting after earlier bytes have been drained.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def iter_parquet(chunks: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """Encode frames as one Parquet file, one row group per chunk"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _DrainingSink()
+    writer = None
+    schema = None
+    for chunk in chunks:
+        chunk = chunk.reindex(columns=EXPORT_COLUMNS)
+        # Plain strings, so every row group has the same schema whatever its categories
+        chunk = chunk.astype({c: object for c in chunk.columns if isinstance(chunk[c].dtype, pd.CategoricalDtype)})
+        table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+        if writer is None:
+            schema = table.schema
+            writer = pq.ParquetWriter(sink, schema)
+        writer.write_table(table)
+        yield sink.drain()
+
+    if writer is None:
+        empty = pd.DataFrame(columns=EXPORT_COLUMNS).astype({
+            'sale_id': 'int32', 'date': 'datetime64[ns]', 'transaction_id': 'Int32', 'product_id': 'int32',
+            'name': object, 'category': object, 'quantity': 'int32', 'sale_price': 'float64'
+        })
+        writer = pq.ParquetWriter(sink, pa.Schema.from_pandas(empty, preserve_index=False))
+    writer.close()
+    yield sink.drain()
+
+
+def iter_export(chunks: Iterable[pd.DataFrame], fmt: str = 'csv') -> Iterator[bytes]:
+    """Encode frames in the named export format"""
+    if fmt == 'csv':
+        return iter_csv(chunks)
+    if fmt == 'parquet':
+        return iter_parquet(chunks)
+    raise ValueError(f"Unknown export format: {fmt}")
@@ -0,0 +1,155 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+import pandas as pd
+
+# Upper bounds, in milliseconds, of the latency histogram buckets; the last bucket is open-ended
+BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+
+class _Span:
+    """A timing in progress; set `rows` to record how many rows it scanned"""
+
+    def __init__(self):
+        self.rows: Optional[int] = None
+
+
+class _Timer:
+    """Latency histogram and row count for one instrumented name"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+
+    def add(self, ms: float, rows: Optional[int]) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.calls += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        if rows is not None:
+            self.rows += rows
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th percentile call"""
+        rank = q * self.calls
+        seen = 0
+        for bound, count in zip(BUCKETS_MS + [self.max_ms], self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+
+class Metrics:
+    """Process-wide, opt-in timings of data access and page sections.
+
+    Nothing is recorded unless enabled, either with BBMOBILE_METRICS=1 or
+    from the diagnostics page, so instrumented code costs one attribute
+    check when it is off.
+    """
+
+    def __init__(self, enabled: bool = False, log_size: int = 2000):
+        self.enabled = enabled
+        self._timers = {}
+        self._log = deque(maxlen=log_size)
+        self._lock = threading.Lock()
+
+    def record(self, name: str, ms: float, rows: Optional[int] = None) -> None:
+        with self._lock:
+            self._timers.setdefault(name, _Timer()).add(ms, rows)
+            self._log.append({'at': datetime.now().isoformat(timespec='milliseconds'),
+                              'name': name, 'ms': round(ms, 3), 'rows': rows})
+
+    @contextmanager
+    def timed(self, name: str):
+        """Time the enclosed block under name"""
+        if not self.enabled:
+            yield _Span()
+            return
+        span = _Span()
+        started = time.perf_counter()
+        try:
+            yield span
+        finally:
+            self.record(name, (time.perf_counter() - started) * 1000, span.rows)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._timers.clear()
+            self._log.clear()
+
+    def summary(self) -> pd.DataFrame:
+        """One row per instrumented name: calls, latency percentiles and rows scanned"""
+        with self._lock:
+            rows = [{
+                'name': name,
+                'calls': timer.calls,
+                'mean_ms': timer.total_ms / timer.calls,
+                'p50_ms': timer.percentile(0.5),
+                'p95_ms': timer.percentile(0.95),
+                'max_ms': timer.max_ms,
+                'total_ms': timer.total_ms,
+                'rows': timer.rows
+            } for name, timer in self._timers.items()]
+        columns = ['name', 'calls', 'mean_ms', 'p50_ms', 'p95_ms', 'max_ms', 'total_ms', 'rows']
+        return pd.DataFrame(rows, columns=columns).sort_values('total_ms', ascending=False, ignore_index=True)
+
+    def histogram(self, name: str) -> pd.DataFrame:
+        """Call counts per latency bucket for one name"""
+        with self._lock:
+            timer = self._timers.get(name)
+            counts = list(timer.counts) if timer else [0] * (len(BUCKETS_MS) + 1)
+        labels = [f"≤{bound:g}ms" for bound in BUCKETS_MS] + [f">{BUCKETS_MS[-1]:g}ms"]
+        return pd.DataFrame({'bucket': labels, 'calls': counts})
+
+    def to_json(self, cache_stats: Optional[dict] = None) -> str:
+        """Everything recorded so far, plus any cache statistics, as a JSON log"""
+        with self._lock:
+            log = list(self._log)
+            histograms = {
+                name: dict(zip([str(b) for b in BUCKETS_MS] + ['inf'], timer.counts))
+                for name, timer in self._timers.items()
+            }
+        return json.dumps({
+            'exported_at': datetime.now().isoformat(timespec='seconds'),
+            'buckets_ms': BUCKETS_MS,
+            'summary': self.summary().to_dict('records'),
+            'histograms': histograms,
+            'cache': cache_stats or {},
+            'events': log
+        }, indent=2)
+
+
+metrics = Metrics(enabled=os.environ.get('BBMOBILE_METRICS', '').lower() in ('1', 'true', 'yes'))
+
+
+def timed(name: str):
+    """Context manager timing a block, such as a page section, when metrics are enabled"""
+    return metrics.timed(name)
+
+
+def instrumented(method):
+    """Time every call of a DataManager method, counting the rows of DataFrame results"""
+    name = f"DataManager.{method.__name__}"
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        if not metrics.enabled:
+            return method(*args, **kwargs)
+        with metrics.timed(name) as span:
+            result = method(*args, **kwargs)
+            if isinstance(result, pd.DataFrame):
+                span.rows = len(result)
+            return result
+    return wrapper
@@ -0,0 +1,243 @@
+import argparse
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime
+from typing import List, NamedTuple, Optional
+
+
+class SmsMessage(NamedTuple):
+    to: str
+    body: str
+
+
+class Transport:
+    """Delivers SMS messages; `send` may block on the network and raise on failure"""
+
+    def send(self, message: SmsMessage) -> None:
+        raise NotImplementedError
+
+
+class TwilioTransport(Transport):
+    """Sends through the Twilio REST API"""
+
+    def __init__(self, account_sid: str, auth_token: str, from_number: str):
+        from twilio.rest import Client
+
+        self.client = Client(account_sid, auth_token)
+        self.from_number = from_number
+
+    def send(self, message: SmsMessage) -> None:
+        self.client.messages.create(to=message.to, from_=self.from_number, body=message.body)
+
+
+class FakeTransport(Transport):
+    """Keeps messages in memory instead of sending them, for local runs and tests.
+
+    The first `fail_times` sends raise, to exercise retries.
+    """
+
+    def __init__(self, fail_times: int = 0):
+        self.sent: List[SmsMessage] = []
+        self.fail_times = fail_times
+        self._lock = threading.Lock()
+
+    def send(self, message: SmsMessage) -> None:
+        with self._lock:
+            if self.fail_times > 0:
+                self.fail_times -= 1
+                raise ConnectionError("fake transport failure")
+            self.sent.append(message)
+
+
+class NotificationDispatcher:
+    """Sends SMS notifications from a background thread so callers never wait on the network.
+
+    `notify` only puts the message on a bounded queue; when the queue is
+    full the message is dropped and counted rather than blocking a sale.
+    The worker waits up to `batch_window` seconds for more messages and
+    joins those for the same recipient into one SMS, sends no more than
+    `per_minute` SMS a minute, and retries failed sends with exponential
+    backoff.
+    """
+
+    MAX_BODY = 1600  # Twilio's limit for one message body
+
+    def __init__(self, transport: Transport, recipients: List[str], max_queue: int = 100,
+                 batch_window: float = 5.0, max_batch: int = 20, per_minute: int = 30,
+                 retries: int = 3, backoff: float = 2.0):
+        self.transport = transport
+        self.recipients = list(recipients)
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.min_interval = 60.0 / per_minute
+        self.retries = retries
+        self.backoff = backoff
+
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._next_send = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bbmobile-notifier", daemon=True)
+        self._thread.start()
+
+    def notify(self, body: str) -> bool:
+        """Queue a message for every recipient; returns False if it was dropped"""
+        try:
+            self._queue.put_nowait(body)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued message has been sent or given up on"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Send what is queued, then stop the worker"""
+        self.flush(timeout)
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {'queued': self._queue.qsize(), 'sent': self.sent, 'dropped': self.dropped,
+                'failed': self.failed, 'last_error': self.last_error}
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                for body in self._join(batch):
+                    for to in self.recipients:
+                        self._send(SmsMessage(to, body))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _join(self, bodies: List[str]) -> List[str]:
+        """Pack queued bodies into as few SMS bodies as fit"""
+        joined = []
+        for body in bodies:
+            body = body[:self.MAX_BODY]
+            if joined and len(joined[-1]) + 1 + len(body) <= self.MAX_BODY:
+                joined[-1] += '\n' + body
+            else:
+                joined.append(body)
+        return joined
+
+    def _send(self, message: SmsMessage) -> None:
+        for attempt in range(self.retries + 1):
+            wait = self._next_send - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._next_send = time.monotonic() + self.min_interval
+            try:
+                self.transport.send(message)
+                self.sent += 1
+                return
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                if attempt < self.retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+        self.failed += 1
+
+
+def large_sale_threshold() -> Optional[float]:
+    """Sale total from which an alert is sent, from BBMOBILE_SMS_LARGE_SALE; None disables alerts"""
+    value = os.environ.get('BBMOBILE_SMS_LARGE_SALE')
+    return float(value) if value else None
+
+
+def large_sale_text(total: float, items: List[str], when: Optional[datetime] = None) -> str:
+    when = when or datetime.now()
+    return f"B&B Mobile: ${total:,.2f} sale at {when:%H:%M} ({', '.join(items)})"
+
+
+def daily_summary_text(summary, day: date) -> str:
+    """One-line revenue summary from a `DataManager.get_daily_summary` frame for the day"""
+    revenue = float(summary['revenue'].sum()) if not summary.empty else 0.0
+    expenses = float(summary['expenses'].sum()) if not summary.empty else 0.0
+    sale_count = int(summary['sale_count'].sum()) if not summary.empty else 0
+    return (f"B&B Mobile {day:%Y-%m-%d}: {sale_count} sales, revenue ${revenue:,.2f}, "
+            f"expenses ${expenses:,.2f}, profit ${revenue - expenses:,.2f}")
+
+
+def transport_from_env() -> Optional[Transport]:
+    """A Twilio transport from TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN and TWILIO_FROM_NUMBER.
+
+    BBMOBILE_SMS_TRANSPORT=fake uses an in-memory transport instead.
+    """
+    if os.environ.get('BBMOBILE_SMS_TRANSPORT', '').lower() == 'fake':
+        return FakeTransport()
+    account_sid = os.environ.get('TWILIO_ACCOUNT_SID')
+    auth_token = os.environ.get('TWILIO_AUTH_TOKEN')
+    from_number = os.environ.get('TWILIO_FROM_NUMBER')
+    if not (account_sid and auth_token and from_number):
+        return None
+    return TwilioTransport(account_sid, auth_token, from_number)
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> Optional[NotificationDispatcher]:
+    """The process-wide dispatcher, or None unless BBMOBILE_SMS_TO and a transport are configured"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            recipients = [n.strip() for n in os.environ.get('BBMOBILE_SMS_TO', '').split(',') if n.strip()]
+            transport = transport_from_env() if recipients else None
+            if transport is None:
+                return None
+            _dispatcher = NotificationDispatcher(transport, recipients)
+        return _dispatcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description="B&B Mobile SMS notifications")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    summary = subparsers.add_parser('summary', help="Send the end-of-day revenue summary, e.g. from cron")
+    summary.add_argument('--data-dir', default='data')
+    summary.add_argument('--date', type=date.fromisoformat, help="Day to summarize (default: today)")
+
+    args = parser.parse_args()
+    if args.command == 'summary':
+        from utils.data_manager import DataManager
+
+        dispatcher = get_dispatcher()
+        if dispatcher is None:
+            parser.error("set BBMOBILE_SMS_TO and the TWILIO_* variables to send notifications")
+        DataManager(args.data_dir).send_daily_summary(args.date)
+        dispatcher.close()
+        print(dispatcher.stats())
+
+
+if __name__ == "__main__":
+    main()
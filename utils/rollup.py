@@ -0,0 +1,66 @@
+from typing import Optional
+
+import pandas as pd
+
+# Per-day totals, maintained incrementally by DataManager's write methods
+DAILY_COUNTERS = ['revenue', 'quantity', 'sale_count', 'expenses']
+CATEGORY_COUNTERS = ['revenue', 'quantity', 'sale_count']
+
+
+def sale_deltas(sale: dict, sign: int = 1) -> dict:
+    """Counter changes caused by adding (sign=1) or removing (sign=-1) a sale"""
+    return {
+        'revenue': sign * float(sale['price']),
+        'quantity': sign * int(sale['quantity']),
+        'sale_count': sign
+    }
+
+
+def build_daily_rollup(sales: Optional[pd.DataFrame], expenses: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Rebuild the per-day rollup from joined sales and expenses; either may be None"""
+    parts = []
+    if sales is not None:
+        parts.append(sales.groupby('date').agg(
+            revenue=('sale_price', 'sum'),
+            quantity=('quantity', 'sum'),
+            sale_count=('sale_id', 'count')
+        ))
+    if expenses is not None:
+        parts.append(expenses.groupby('date').agg(expenses=('amount', 'sum')))
+
+    daily = pd.concat(parts, axis=1).reindex(columns=DAILY_COUNTERS).astype(float).fillna(0)
+    daily = daily.astype({'revenue': float, 'quantity': int, 'sale_count': int, 'expenses': float})
+    return daily.rename_axis('date').reset_index()[['date'] + DAILY_COUNTERS]
+
+
+def build_category_rollup(sales: pd.DataFrame) -> pd.DataFrame:
+    """Rebuild the per-day, per-category rollup from the full joined sales history"""
+    by_category = sales.groupby(['date', 'category'], observed=True).agg(
+        revenue=('sale_price', 'sum'),
+        quantity=('quantity', 'sum'),
+        sale_count=('sale_id', 'count')
+    )
+    return by_category.reset_index()[['date', 'category'] + CATEGORY_COUNTERS]
+
+
+def build_product_sales(sales: pd.DataFrame) -> pd.DataFrame:
+    """Rebuild the per-product sale count, quantity and last sale date"""
+    by_product = sales.groupby('product_id').agg(
+        sale_count=('sale_id', 'count'),
+        quantity=('quantity', 'sum'),
+        last_sold=('date', 'max')
+    )
+    return by_product.reset_index()
+
+
+def build_derived_tables(sales: Optional[pd.DataFrame], expenses: Optional[pd.DataFrame]) -> dict:
+    """Rebuild every table derived from joined sales and expenses.
+
+    Given only a batch of new records, the result is the batch's
+    contribution to each table, ready for `increment_many`.
+    """
+    derived = {'daily_rollup': build_daily_rollup(sales, expenses)}
+    if sales is not None:
+        derived['daily_category_rollup'] = build_category_rollup(sales)
+        derived['product_sales'] = build_product_sales(sales)
+    return derived
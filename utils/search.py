@@ -0,0 +1,136 @@
+import bisect
+import re
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(text) -> str:
+    """Lowercase text with accents stripped and punctuation turned into single spaces"""
+    if not isinstance(text, str):
+        return ''
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode()
+    return _NON_WORD.sub(' ', text.lower()).strip()
+
+
+def trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ProductSearchIndex:
+    """Substring search over product name, category and notes.
+
+    Each product's fields are normalized into one string. Terms of three
+    or more characters are looked up by their trigrams, whose posting
+    sets are intersected smallest first, and the few candidates left are
+    checked for the actual substring. Shorter terms match the start of
+    any word, through a sorted word list searched by bisection. Every
+    term of a query must match.
+    """
+
+    def __init__(self):
+        self._texts: Dict[int, str] = {}
+        self._postings: Dict[str, set] = {}
+        self._words: Dict[str, set] = {}
+        self._sorted_words: Optional[List[str]] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, ids: Iterable[int], names: Iterable, categories: Iterable, notes: Iterable) -> 'ProductSearchIndex':
+        index = cls()
+        for product_id, name, category, note in zip(ids, names, categories, notes):
+            index.add(product_id, name, category, note)
+        return index
+
+    def __getstate__(self) -> dict:
+        # Copied under the lock, since snapshots are pickled while clerks keep adding products
+        with self._lock:
+            return {
+                'texts': dict(self._texts),
+                'postings': {gram: set(ids) for gram, ids in self._postings.items()},
+                'words': {word: set(ids) for word, ids in self._words.items()}
+            }
+
+    def __setstate__(self, state: dict) -> None:
+        self._texts = state['texts']
+        self._postings = state['postings']
+        self._words = state['words']
+        self._sorted_words = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def add(self, product_id: int, name, category, notes) -> None:
+        """Index a product, replacing what was indexed for its ID before"""
+        product_id = int(product_id)
+        text = ' '.join(part for part in map(normalize, (name, category, notes)) if part)
+        with self._lock:
+            self._remove(product_id)
+            self._texts[product_id] = text
+            for gram in trigrams(text):
+                self._postings.setdefault(gram, set()).add(product_id)
+            for word in set(text.split()):
+                if word not in self._words:
+                    self._words[word] = set()
+                    self._sorted_words = None
+                self._words[word].add(product_id)
+
+    def remove(self, product_id: int) -> None:
+        with self._lock:
+            self._remove(int(product_id))
+
+    def _remove(self, product_id: int) -> None:
+        text = self._texts.pop(product_id, None)
+        if text is None:
+            return
+        for gram in trigrams(text):
+            posting = self._postings[gram]
+            posting.discard(product_id)
+            if not posting:
+                del self._postings[gram]
+        for word in set(text.split()):
+            ids = self._words[word]
+            ids.discard(product_id)
+            if not ids:
+                del self._words[word]
+                self._sorted_words = None
+
+    def _match(self, term: str) -> set:
+        if len(term) >= 3:
+            postings = sorted((self._postings.get(gram, set()) for gram in trigrams(term)), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+            return {product_id for product_id in candidates if term in self._texts[product_id]}
+
+        if self._sorted_words is None:
+            self._sorted_words = sorted(self._words)
+        words = self._sorted_words
+        matches = set()
+        for i in range(bisect.bisect_left(words, term), len(words)):
+            if not words[i].startswith(term):
+                break
+            matches |= self._words[words[i]]
+        return matches
+
+    def search(self, query: str, rank: Optional[Dict[int, float]] = None) -> List[int]:
+        """IDs of products matching every term of query.
+
+        With `rank`, a score per ID such as its number of sales, the best scoring
+        come first; otherwise IDs are in ascending order.
+        """
+        terms = normalize(query).split()
+        if not terms:
+            return []
+        with self._lock:
+            # Most selective terms first, so later ones only filter a small set
+            matches = None
+            for term in sorted(terms, key=len, reverse=True):
+                found = self._match(term)
+                matches = found if matches is None else matches & found
+                if not matches:
+                    return []
+        if rank is not None:
+            return sorted(matches, key=lambda product_id: (-rank.get(product_id, 0), product_id))
+        return sorted(matches)
@@ -0,0 +1,210 @@
+import glob
+import json
+import os
+import pickle
+import threading
+import time
+from typing import Any, Hashable
+
+import pandas as pd
+
+MISSING = object()
+
+
+class SnapshotStore:
+    """Pickled copies of parsed tables, so a cold process can skip parsing the data files.
+
+    Each snapshot starts with the fingerprint of the data it was made
+    from, and is only loaded while that fingerprint still matches. Saves
+    are collected and written by a background thread shortly after the
+    last write, so a burst of sales costs one snapshot, not one each.
+    """
+
+    DELAY = 1.0
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bbmobile-snapshot", daemon=True)
+        self._thread.start()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.pkl")
+
+    def load(self, name: str, fingerprint: Hashable) -> Any:
+        """The snapshot of name made at fingerprint, or MISSING"""
+        try:
+            with open(self._path(name), 'rb') as f:
+                if pickle.load(f) != fingerprint:
+                    return MISSING
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return MISSING
+
+    def latest(self, name: str) -> Any:
+        """(fingerprint, value) of the last snapshot of name, whatever data it was made from, or MISSING"""
+        try:
+            with open(self._path(name), 'rb') as f:
+                return pickle.load(f), pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return MISSING
+
+    def save(self, name: str, fingerprint: Hashable, value: Any) -> None:
+        """Write a snapshot in the background, replacing any earlier one still waiting"""
+        with self._lock:
+            self._pending[name] = (fingerprint, value)
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            # Let a burst of writes settle before snapshotting
+            while self._wake.wait(self.DELAY):
+                self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                pass  # A missing snapshot only costs the next cold start a parse
+
+    def flush(self) -> None:
+        """Write every waiting snapshot now"""
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            os.makedirs(self.directory, exist_ok=True)
+            for name, (fingerprint, value) in pending.items():
+                self._dump(name, fingerprint, value)
+
+    def _dump(self, name: str, fingerprint: Hashable, value: Any) -> None:
+        path = self._path(name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(fingerprint, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def discard(self, name: str) -> None:
+        """Delete the snapshot of name, and any save of it still waiting"""
+        with self._write_lock:
+            with self._lock:
+                self._pending.pop(name, None)
+            if os.path.exists(self._path(name)):
+                os.remove(self._path(name))
+
+
+class ArrowSnapshotStore(SnapshotStore):
+    """Frames published as Arrow IPC files that every server process memory-maps.
+
+    Each publish writes a new <name>-<version>.arrow file and then points
+    <name>.stamp.json at it, together with the fingerprint of the data.
+    `load` maps the file the stamp names and keeps returning that same
+    frame until the stamp changes, so every process reads one copy of the
+    table from the page cache instead of holding its own. The stamp also
+    records the frame's dtypes, which are restored on load so the frame
+    matches what the backends return.
+
+    Only numeric and date columns without nulls map zero-copy, so the
+    large sales history is cached as exactly that (see SalesView) and
+    takes no per-process memory as it grows. Other columns are rebuilt
+    in each process: text is stored dictionary-encoded and comes back as
+    object columns, 8 bytes a row, and nullable integers are copied with
+    their null mask. That is only worth it for small tables like
+    expenses. Needs pyarrow.
+    """
+
+    def __init__(self, directory: str):
+        import pyarrow  # noqa: F401  Fail here, not on the background thread
+
+        super().__init__(directory)
+        # name -> (stamp mtime, fingerprint, mapped frame)
+        self._mapped = {}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.stamp.json")
+
+    @staticmethod
+    def _stamp_key(fingerprint: Hashable):
+        # Tuples come back from JSON as lists
+        return json.loads(json.dumps(fingerprint))
+
+    def load(self, name: str, fingerprint: Hashable) -> Any:
+        """The published frame of name made at fingerprint, or MISSING"""
+        latest = self.latest(name)
+        if latest is MISSING or latest[0] != self._stamp_key(fingerprint):
+            return MISSING
+        return latest[1]
+
+    def latest(self, name: str) -> Any:
+        import pyarrow as pa
+
+        try:
+            mtime = os.stat(self._path(name)).st_mtime_ns
+            mapped = self._mapped.get(name)
+            if mapped is None or mapped[0] != mtime:
+                with open(self._path(name)) as f:
+                    stamp = json.load(f)
+                source = pa.memory_map(os.path.join(self.directory, stamp['file']))
+                df = pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+                for column, dtype in stamp.get('dtypes', {}).items():
+                    # Column by column, since astype on the frame would copy the mapped columns too
+                    if column in df and str(df[column].dtype) != dtype:
+                        df[column] = df[column].astype(dtype)
+                mapped = self._mapped[name] = (mtime, stamp['fingerprint'], df)
+        except (OSError, ValueError, KeyError, pa.ArrowException):
+            return MISSING
+        return mapped[1], mapped[2]
+
+    def _dump(self, name: str, fingerprint: Hashable, value: Any) -> None:
+        import pyarrow as pa
+
+        if not isinstance(value, pd.DataFrame):
+            # Views that defer joining new rows, like the sales view, are joined here, off the writer
+            value = value.frame()
+        table = pa.Table.from_pandas(value, preserve_index=False)
+        for i, field in enumerate(table.schema):
+            if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+                table = table.set_column(i, field.name, table.column(i).dictionary_encode())
+
+        file = f"{name}-{time.time_ns()}.arrow"
+        path = os.path.join(self.directory, file)
+        with pa.OSFile(f"{path}.tmp", 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(f"{path}.tmp", path)
+
+        stamp_path = self._path(name)
+        with open(f"{stamp_path}.tmp", 'w') as f:
+            json.dump({'fingerprint': fingerprint, 'file': file,
+                       'dtypes': {column: str(dtype) for column, dtype in value.dtypes.items()}}, f)
+        os.replace(f"{stamp_path}.tmp", stamp_path)
+        self._remove_files(name, keep=file)
+
+    def _remove_files(self, name: str, keep: str = None) -> None:
+        # Processes still mapping an old file keep reading it until they reopen
+        for path in glob.glob(os.path.join(self.directory, f"{name}-*.arrow")):
+            if os.path.basename(path) != keep:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass  # Windows won't delete a mapped file; the next publish retries
+
+    def discard(self, name: str) -> None:
+        super().discard(name)
+        self._mapped.pop(name, None)
+        self._remove_files(name)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_snapshot_store(directory: str, shared: bool = False) -> SnapshotStore:
+    """The process-wide snapshot store for directory; with shared, the memory-mapped Arrow store"""
+    key = (os.path.abspath(directory), shared)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = (ArrowSnapshotStore if shared else SnapshotStore)(key[0])
+        return _stores[key]
@@ -0,0 +1,1394 @@
+import argparse
+import glob
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Iterator, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.rollup import build_derived_tables
+from utils.writer import file_lock, get_write_queue
+
+TABLES = {
+    'products': ['id', 'name', 'category', 'price', 'created_at', 'notes'],
+    'sales': ['id', 'product_id', 'quantity', 'price', 'date', 'transaction_id'],
+    'expenses': ['id', 'description', 'amount', 'date'],
+    'transactions': ['id', 'date', 'item_count', 'total'],
+    'daily_rollup': ['date', 'revenue', 'quantity', 'sale_count', 'expenses'],
+    'daily_category_rollup': ['date', 'category', 'revenue', 'quantity', 'sale_count'],
+    'product_sales': ['product_id', 'sale_count', 'quantity', 'last_sold']
+}
+
+# Tables holding source records; the rest are derived from them
+BASE_TABLES = ('products', 'sales', 'expenses', 'transactions')
+
+# Key columns used by `increment` and for ordering; other tables are keyed by `id`
+TABLE_KEYS = {
+    'transactions': ['id'],
+    'daily_rollup': ['date'],
+    'daily_category_rollup': ['date', 'category'],
+    'product_sales': ['product_id']
+}
+
+# Column dtypes applied when a table is loaded
+SCHEMAS = {
+    'products': {'id': 'int32', 'name': 'object', 'category': 'category', 'price': 'float64', 'notes': 'object'},
+    'sales': {'id': 'int32', 'product_id': 'int32', 'quantity': 'int32', 'price': 'float64', 'transaction_id': 'Int32'},
+    'expenses': {'id': 'int32', 'description': 'object', 'amount': 'float64'},
+    'transactions': {'id': 'int32', 'item_count': 'int32', 'total': 'float64'},
+    'daily_rollup': {'revenue': 'float64', 'quantity': 'int32', 'sale_count': 'int32', 'expenses': 'float64'},
+    'daily_category_rollup': {'category': 'category', 'revenue': 'float64', 'quantity': 'int32', 'sale_count': 'int32'},
+    'product_sales': {'product_id': 'int32', 'sale_count': 'int32', 'quantity': 'int32'}
+}
+
+# Date columns and the fixed format they are stored in
+DATE_FORMAT = '%Y-%m-%d'
+DATE_COLUMNS = {
+    'products': {'created_at': '%Y-%m-%d %H:%M:%S'},
+    'sales': {'date': DATE_FORMAT},
+    'expenses': {'date': DATE_FORMAT},
+    'transactions': {'date': DATE_FORMAT},
+    'daily_rollup': {'date': DATE_FORMAT},
+    'daily_category_rollup': {'date': DATE_FORMAT},
+    'product_sales': {'last_sold': DATE_FORMAT}
+}
+
+# Column renames applied when sales are joined with products
+SALES_RENAMES = {'price': 'sale_price', 'id': 'sale_id'}
+PRODUCT_RENAMES = {'price': 'product_price', 'id': 'product_id'}
+
+# Columns of the joined sales view that pages may sort and filter by, and their SQL
+SALES_PAGE_COLUMNS = {
+    'date': 's.date',
+    'sale_id': 's.id',
+    'product_id': 's.product_id',
+    'quantity': 's.quantity',
+    'sale_price': 's.price',
+    'transaction_id': 's.transaction_id',
+    'name': 'p.name',
+    'category': 'p.category'
+}
+
+
+class Page(NamedTuple):
+    """One page of a sorted query, and how many rows the whole query matched"""
+    rows: pd.DataFrame
+    total: int
+    offset: int
+    limit: int
+
+    @property
+    def pages(self) -> int:
+        return max(1, -(-self.total // self.limit))
+
+
+def iso_date(value: Optional[date]) -> Optional[str]:
+    """Dates are stored as ISO strings, so they compare correctly as text"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.isoformat()
+
+
+def apply_schema(df: pd.DataFrame, table: str, renames: Optional[dict] = None) -> pd.DataFrame:
+    """Give a loaded table its declared dtypes.
+
+    `renames` maps schema column names to the names used in `df`, for
+    frames whose columns were renamed by a join.
+    """
+    renames = renames or {}
+    dtypes = {renames.get(c, c): t for c, t in SCHEMAS[table].items() if renames.get(c, c) in df}
+    df = df.astype(dtypes)
+    for column, fmt in DATE_COLUMNS[table].items():
+        column = renames.get(column, column)
+        if column in df and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column], format=fmt)
+    return df
+
+
+def to_storage(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    """Format a table's date columns back into their stored text form"""
+    df = df.reindex(columns=TABLES[table])
+    for column, fmt in DATE_COLUMNS[table].items():
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            df = df.assign(**{column: df[column].dt.strftime(fmt)})
+    return df
+
+
+def assign_where(df: pd.DataFrame, mask: pd.Series, changes: dict) -> pd.DataFrame:
+    """Set columns on the rows selected by mask, growing categoricals as needed.
+
+    Modifies df in place, so pass a copy of any frame that is shared.
+    """
+    for column, value in changes.items():
+        if isinstance(df[column].dtype, pd.CategoricalDtype) and value not in df[column].cat.categories:
+            df[column] = df[column].cat.add_categories([value])
+        df.loc[mask, column] = value
+    return df
+
+
+def filter_frame(df: pd.DataFrame, filters: Optional[dict] = None) -> pd.DataFrame:
+    """Rows where each filtered column equals its value, or is in it when the value is a list"""
+    for column, value in (filters or {}).items():
+        df = df[df[column].isin(value) if isinstance(value, (list, tuple, set)) else df[column] == value]
+    return df
+
+
+def page_frame(df: pd.DataFrame, offset: int, limit: int, sort: str, descending: bool = False) -> Page:
+    """Rows offset to offset + limit of df ordered by sort.
+
+    A frame already in sort order, like the date-sorted sales view, is
+    sliced without sorting.
+    """
+    values = df[sort]
+    if values.is_monotonic_increasing:
+        order = np.arange(len(df))
+    else:
+        order = np.argsort(values.to_numpy(), kind='stable')
+    if descending:
+        order = order[::-1]
+    return Page(df.iloc[order[offset:offset + limit]].reset_index(drop=True), len(df), offset, limit)
+
+
+def join_sales(sales: pd.DataFrame, products: pd.DataFrame) -> pd.DataFrame:
+    """Join sales with their product details, keeping the order of the sales.
+
+    Sales of unknown products are dropped, as by an inner join. Product
+    rows are picked by position rather than merged, which is about twice
+    as fast and is done on every read of the cached sales.
+    """
+    positions = pd.Index(products['id']).get_indexer(sales['product_id'])
+    if (positions < 0).any():
+        sales, positions = sales[positions >= 0], positions[positions >= 0]
+    # Rename columns to avoid confusion after the join
+    sales = sales.rename(columns=SALES_RENAMES).reset_index(drop=True)
+    details = products.drop(columns='id').rename(columns=PRODUCT_RENAMES).take(positions)
+    details.index = sales.index
+    return pd.concat([sales, details], axis=1)
+
+
+class StorageBackend:
+    """Where DataManager keeps its tables.
+
+    Backends with `indexed = True` can answer date-range, lookup and page
+    queries without loading a whole table, so DataManager pushes those down
+    instead of filtering in pandas. `indexes` says which tables date-range
+    reads are pushed down for.
+    """
+
+    indexed = False
+
+    def indexes(self, table: str) -> bool:
+        """Whether date ranges of `table` are read without loading all of it"""
+        return self.indexed
+
+    @property
+    def cache_key(self) -> str:
+        """Identifies the underlying data in the shared cache"""
+        raise NotImplementedError
+
+    @property
+    def lock_path(self) -> str:
+        """File locked by every process while it writes this data"""
+        raise NotImplementedError
+
+    def fingerprint(self, *tables: str) -> tuple:
+        """A value that changes whenever any of the given tables is written"""
+        raise NotImplementedError
+
+    def ensure_tables(self) -> list:
+        """Create missing tables and return the names of those created"""
+        raise NotImplementedError
+
+    def recover(self) -> list:
+        """Finish writes interrupted by a crash; returns the tables that had some"""
+        return []
+
+    def log_since(self, table: str, fingerprint) -> Optional[list]:
+        """Writes to table since it had `fingerprint` (one part of `fingerprint(table)`), as log entries.
+
+        None when they can't be told apart from the rest of the table, in
+        which case the table has to be read again.
+        """
+        return None
+
+    def read_table(self, table: str) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def write_table(self, table: str, df: pd.DataFrame) -> None:
+        """Replace the whole contents of a table"""
+        raise NotImplementedError
+
+    def get_row(self, table: str, row_id: int) -> Optional[dict]:
+        """Fetch a single record by ID, or None if it doesn't exist"""
+        df = self.read_table(table)
+        match = df[df['id'] == row_id]
+        return match.iloc[0].to_dict() if not match.empty else None
+
+    def insert(self, table: str, row: dict) -> int:
+        """Insert a record, allocating its ID, and return the ID"""
+        raise NotImplementedError
+
+    def insert_many(self, table: str, df: pd.DataFrame) -> range:
+        """Insert records in one write, allocating a block of IDs, and return the IDs"""
+        raise NotImplementedError
+
+    def insert_transaction(self, header: dict, lines: pd.DataFrame) -> Tuple[int, range]:
+        """Insert a transaction and its sale lines; returns the transaction ID and the sale IDs.
+
+        Backends with transactions write both or neither. Here the header
+        goes first, so a crash in between leaves a header without lines,
+        which the repair after an interrupted write drops.
+        """
+        transaction_id = self.insert('transactions', header)
+        return transaction_id, self.insert_many('sales', lines.assign(transaction_id=transaction_id))
+
+    def delete(self, table: str, row_id: int) -> None:
+        raise NotImplementedError
+
+    def update(self, table: str, row_id: int, changes: dict) -> None:
+        """Overwrite some fields of the record with the given ID"""
+        df = self.read_table(table)
+        self.write_table(table, assign_where(df, df['id'] == row_id, changes))
+
+    def increment(self, table: str, key: dict, deltas: dict, values: Optional[dict] = None) -> None:
+        """Add deltas to the counters of the row with the given key, creating it if needed.
+
+        Columns in `values` are overwritten rather than added to.
+        """
+        values = values or {}
+        df = self.read_table(table)
+        key_columns = TABLE_KEYS[table]
+
+        new_row = {column: None if column in DATE_COLUMNS[table] else 0 for column in TABLES[table]}
+        new_row.update(key)
+        new_row.update(deltas)
+        new_row.update(values)
+        new_df = apply_schema(pd.DataFrame([new_row], columns=TABLES[table]), table)
+
+        match = pd.Series(True, index=df.index)
+        for column in key_columns:
+            match &= df[column].astype(object) == new_df[column].iloc[0]
+
+        if match.any():
+            for column, delta in deltas.items():
+                df.loc[match, column] += delta
+            for column in values:
+                df.loc[match, column] = new_df[column].iloc[0]
+        else:
+            df = new_df if df.empty else pd.concat([df, new_df], ignore_index=True)
+            df = df.sort_values(key_columns, ignore_index=True)
+        self.write_table(table, df)
+
+    def increment_many(self, table: str, rows: pd.DataFrame, maxima: tuple = ()) -> None:
+        """Add many rows of counter deltas at once, keyed like `increment`.
+
+        Columns named in `maxima` keep the larger of the stored and new value.
+        """
+        if rows.empty:
+            return
+        key_columns = TABLE_KEYS[table]
+        existing = self.read_table(table)
+        rows = apply_schema(rows[TABLES[table]], table)
+        combined = rows if existing.empty else pd.concat([existing, rows], ignore_index=True)
+        aggregations = {c: 'max' if c in maxima else 'sum' for c in TABLES[table] if c not in key_columns}
+        combined = combined.groupby(key_columns, observed=True, as_index=False).agg(aggregations)
+        self.write_table(table, combined)
+
+    def latest_date(self, table: str, column: str, value) -> Optional[str]:
+        """The latest `date` among records where `column` equals `value`"""
+        df = self.read_table(table)
+        dates = df.loc[df[column] == value, 'date']
+        return iso_date(dates.max()) if not dates.empty else None
+
+    def read_range(self, table: str, start: Optional[date] = None,
+                   end: Optional[date] = None) -> pd.DataFrame:
+        """Read records whose `date` falls within [start, end]"""
+        df = self.read_table(table)
+        if start is not None:
+            df = df[df['date'] >= pd.Timestamp(iso_date(start))]
+        if end is not None:
+            df = df[df['date'] <= pd.Timestamp(iso_date(end))]
+        return df
+
+    def query_sales(self, start: Optional[date] = None,
+                    end: Optional[date] = None) -> pd.DataFrame:
+        """Sales within [start, end] joined with their product details"""
+        return join_sales(self.read_range('sales', start, end), self.read_table('products'))
+
+    def query_product_sales(self, product_id: int) -> pd.DataFrame:
+        """One product's sales joined with its details"""
+        sales = self.read_table('sales')
+        return join_sales(sales[sales['product_id'] == product_id], self.read_table('products'))
+
+    def iter_sales(self, start: Optional[date] = None, end: Optional[date] = None,
+                   chunksize: int = 50_000) -> Iterator[pd.DataFrame]:
+        """Joined sales within [start, end], in date order, a chunk at a time"""
+        sales = self.query_sales(start, end)
+        for offset in range(0, len(sales), chunksize):
+            yield sales.iloc[offset:offset + chunksize]
+
+    def query_sales_page(self, start: Optional[date] = None, end: Optional[date] = None,
+                         offset: int = 0, limit: int = 50, sort: str = 'date', descending: bool = True,
+                         filters: Optional[dict] = None) -> Page:
+        """One page of the joined sales within [start, end], sorted and filtered by SALES_PAGE_COLUMNS"""
+        sales = filter_frame(self.query_sales(start, end), filters)
+        return page_frame(sales, offset, limit, sort, descending)
+
+
+class CSVBackend(StorageBackend):
+    """One CSV file per table, plus a JSON file of ID sequences.
+
+    Inserts, updates and deletes of records are not written to the table
+    files directly. Each is appended to the table's write-ahead log under
+    <data_dir>/wal/ and fsynced, which is cheap and survives a crash at
+    any point. Reads apply the pending log on top of the file. Once a log
+    grows past COMPACT_BYTES it is folded into the file in the
+    background: it is first renamed aside, so writes made meanwhile start
+    a new log instead of being deleted with the old one. Startup recovery
+    only cuts off an entry a crash left half-written; pending entries
+    wait for the next compaction.
+    Derived tables are rewritten atomically instead, since they can be
+    rebuilt from the records.
+    """
+
+    SEQUENCES_FILE = 'sequences.json'
+    WAL_DIR = 'wal'
+    COMPACT_BYTES = 256 * 1024
+
+    def __init__(self, data_dir: str = "data"):
+        self.data_dir = data_dir
+        self._compaction_pending = set()
+
+    def _path(self, table: str) -> str:
+        return os.path.join(self.data_dir, f"{table}.csv")
+
+    def _wal_path(self, table: str) -> str:
+        return os.path.join(self.data_dir, self.WAL_DIR, f"{table}.jsonl")
+
+    def _compacting_path(self, table: str) -> str:
+        return f"{self._wal_path(table)}.compacting"
+
+    def _has_log(self, table: str) -> bool:
+        return os.path.exists(self._wal_path(table)) or os.path.exists(self._compacting_path(table))
+
+    @staticmethod
+    def _size(path: str) -> int:
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    @property
+    def cache_key(self) -> str:
+        return os.path.abspath(self.data_dir)
+
+    @property
+    def lock_path(self) -> str:
+        return os.path.join(self.data_dir, '.write.lock')
+
+    def fingerprint(self, *tables: str) -> tuple:
+        parts = []
+        for table in tables:
+            st = os.stat(self._path(table))
+            parts.append((st.st_mtime_ns, st.st_size,
+                          self._size(self._compacting_path(table)), self._size(self._wal_path(table))))
+        return tuple(parts)
+
+    def ensure_tables(self) -> list:
+        """Create data files if they don't exist"""
+        if not os.path.exists(self.data_dir):
+            os.makedirs(self.data_dir)
+
+        created = []
+        for table, columns in TABLES.items():
+            path = self._path(table)
+            if not os.path.exists(path):
+                pd.DataFrame(columns=columns).to_csv(path, index=False)
+                created.append(table)
+            elif list(pd.read_csv(path, nrows=0).columns) != columns:
+                # Files from before a column was added get it, empty, once
+                self._write_csv(table, pd.read_csv(path, dtype=str, keep_default_na=False))
+        return created
+
+    def _read_csv(self, table: str) -> pd.DataFrame:
+        dates = DATE_COLUMNS[table]
+        return pd.read_csv(
+            self._path(table),
+            dtype=SCHEMAS[table],
+            parse_dates=list(dates),
+            date_format=dates
+        )
+
+    def read_table(self, table: str) -> pd.DataFrame:
+        # The logs are read first: if they are compacted in between, replaying them again is harmless
+        entries = self._read_log(table)
+        df = self._read_csv(table)
+        return self._apply_log(table, df, entries) if entries else df
+
+    def write_table(self, table: str, df: pd.DataFrame) -> None:
+        self._write_csv(table, df)
+        for path in (self._compacting_path(table), self._wal_path(table)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _write_csv(self, table: str, df: pd.DataFrame) -> None:
+        path = self._path(table)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', newline='') as f:
+            to_storage(df, table).to_csv(f, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    # Write-ahead log
+
+    def _log(self, table: str, entries: list) -> None:
+        """Append mutations to a table's log and fsync them before returning"""
+        path = self._wal_path(table)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a') as f:
+            f.writelines(json.dumps(entry) + '\n' for entry in entries)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if os.path.getsize(path) > self.COMPACT_BYTES and table not in self._compaction_pending:
+            self._compaction_pending.add(table)
+            get_write_queue(self.lock_path).submit(lambda: self.compact_log(table))
+
+    def log_since(self, table: str, fingerprint) -> Optional[list]:
+        # Until the next compaction the log only grows, so the new entries are the bytes past its old size
+        mtime, size, compacting, logged = fingerprint
+        current = self.fingerprint(table)[0]
+        if (mtime, size, compacting) != current[:3] or logged > current[3]:
+            return None
+        if logged == current[3]:
+            return []
+        with open(self._wal_path(table), 'rb') as f:
+            f.seek(logged)
+            data = f.read(current[3] - logged)
+        if not data.endswith(b'\n'):
+            return None  # read mid-append
+        return [json.loads(line) for line in data.decode().splitlines()]
+
+    def _read_log(self, table: str) -> list:
+        """Pending entries of a table, those set aside for compaction first.
+
+        The live log is read before the set-aside one, so a compaction
+        renaming it in between leaves its entries in the second read
+        rather than in neither.
+        """
+        live = self._read_log_file(self._wal_path(table))
+        return self._read_log_file(self._compacting_path(table)) + live
+
+    @staticmethod
+    def _read_log_file(path: str) -> list:
+        if not os.path.exists(path):
+            return []
+        entries = []
+        with open(path) as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    break  # torn by a crash mid-append; that write never returned
+                entries.append(json.loads(line))
+        return entries
+
+    @staticmethod
+    def _log_rows(df: pd.DataFrame, table: str) -> list:
+        rows = to_storage(df, table).astype(object)
+        return rows.where(rows.notna(), None).to_dict('records')
+
+    def _apply_log(self, table: str, df: pd.DataFrame, entries: list) -> pd.DataFrame:
+        """Replay log entries over a table's file contents.
+
+        Inserts replace any row with the same ID and deletes and updates
+        set final values, so replaying entries that were already folded
+        in changes nothing.
+        """
+        inserted = [row for entry in entries if entry['op'] == 'insert' for row in entry['rows']]
+        if inserted:
+            rows = apply_schema(pd.DataFrame(inserted, columns=TABLES[table]), table)
+            df = df[~df['id'].isin(rows['id'])]
+            # Re-applying the schema merges categoricals the concat turned into objects
+            df = rows if df.empty else apply_schema(pd.concat([df, rows], ignore_index=True), table)
+
+        deleted = {entry['id'] for entry in entries if entry['op'] == 'delete'}
+        for entry in entries:
+            if entry['op'] == 'update' and entry['id'] not in deleted:
+                df = assign_where(df.copy(), df['id'] == entry['id'], entry['changes'])
+        if deleted:
+            df = df[~df['id'].isin(deleted)]
+        return df.reset_index(drop=True)
+
+    def compact_log(self, table: str) -> int:
+        """Fold a table's log into its file; returns the number of entries folded.
+
+        The log is renamed aside before it is read, and only that file is
+        folded and deleted, so entries appended meanwhile stay in a new log.
+        """
+        self._compaction_pending.discard(table)
+        folded = 0
+        if os.path.exists(self._compacting_path(table)):
+            folded += self._fold_compacting(table)  # set aside by a compaction a crash interrupted
+        if os.path.exists(self._wal_path(table)):
+            os.replace(self._wal_path(table), self._compacting_path(table))
+            folded += self._fold_compacting(table)
+        return folded
+
+    def _fold_compacting(self, table: str) -> int:
+        path = self._compacting_path(table)
+        entries = self._read_log_file(path)
+        if entries:
+            self._write_csv(table, self._apply_log(table, self._read_csv(table), entries))
+        os.remove(path)
+        return len(entries)
+
+    def recover(self) -> list:
+        """Cut off log entries a crash left half-written, which the next append would run into.
+
+        Nothing is folded here, so opening the data never rewrites a table.
+        """
+        recovered = []
+        for table in TABLES:
+            path = self._wal_path(table)
+            if os.path.exists(path) and self._needs_newline(path):
+                with open(path, 'rb+') as f:
+                    f.truncate(f.read().rfind(b'\n') + 1)
+                    f.flush()
+                    os.fsync(f.fileno())
+                recovered.append(table)
+        return recovered
+
+    def _next_id(self, table: str, count: int = 1) -> int:
+        """Allocate the next `count` IDs for a table from the persisted sequence
+        and return the last of them.
+
+        The sequence is seeded once from the table's highest ID, so existing
+        data keeps counting up from where it left off.
+        """
+        seq_path = os.path.join(self.data_dir, self.SEQUENCES_FILE)
+        sequences = {}
+        if os.path.exists(seq_path):
+            with open(seq_path) as f:
+                sequences = json.load(f)
+
+        if table not in sequences:
+            sequences[table] = self._max_id(table)
+
+        sequences[table] += count
+
+        # Synced, so IDs already in a log are never handed out again after a crash
+        tmp_path = f"{seq_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(sequences, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, seq_path)
+        return sequences[table]
+
+    def _max_id(self, table: str) -> int:
+        if self._has_log(table):
+            ids = self.read_table(table)['id']
+        else:
+            ids = pd.read_csv(self._path(table), usecols=['id'])['id']
+        return 0 if ids.empty else int(ids.max())
+
+    @staticmethod
+    def _needs_newline(path: str) -> bool:
+        # Files edited by hand may lack a trailing newline
+        if os.path.getsize(path) == 0:
+            return False
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b'\n'
+
+    def insert_many(self, table: str, df: pd.DataFrame) -> range:
+        last_id = self._next_id(table, len(df))
+        ids = range(last_id - len(df) + 1, last_id + 1)
+        self._log(table, [{'op': 'insert', 'rows': self._log_rows(df.assign(id=list(ids)), table)}])
+        return ids
+
+    def insert(self, table: str, row: dict) -> int:
+        new_id = self._next_id(table)
+        self._log(table, [{'op': 'insert', 'rows': self._log_rows(pd.DataFrame([{**row, 'id': new_id}]), table)}])
+        return new_id
+
+    def delete(self, table: str, row_id: int) -> None:
+        self._log(table, [{'op': 'delete', 'id': int(row_id)}])
+
+    def update(self, table: str, row_id: int, changes: dict) -> None:
+        self._log(table, [{'op': 'update', 'id': int(row_id), 'changes': changes}])
+
+
+class SQLiteBackend(StorageBackend):
+    """A local SQLite database with indexes on the columns pages filter by"""
+
+    indexed = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            category TEXT,
+            price REAL NOT NULL,
+            created_at TEXT,
+            notes TEXT
+        );
+        CREATE TABLE IF NOT EXISTS sales (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            price REAL NOT NULL,
+            date TEXT NOT NULL,
+            transaction_id INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            item_count INTEGER NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS expenses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            description TEXT,
+            amount REAL NOT NULL,
+            date TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS daily_rollup (
+            date TEXT PRIMARY KEY,
+            revenue REAL NOT NULL DEFAULT 0,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            sale_count INTEGER NOT NULL DEFAULT 0,
+            expenses REAL NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS daily_category_rollup (
+            date TEXT NOT NULL,
+            category TEXT NOT NULL,
+            revenue REAL NOT NULL DEFAULT 0,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            sale_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (date, category)
+        );
+        CREATE TABLE IF NOT EXISTS product_sales (
+            product_id INTEGER PRIMARY KEY,
+            sale_count INTEGER NOT NULL DEFAULT 0,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            last_sold TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_sales_date ON sales (date);
+        CREATE INDEX IF NOT EXISTS idx_sales_product_id ON sales (product_id);
+        CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses (date);
+        CREATE INDEX IF NOT EXISTS idx_sales_transaction_id ON sales (transaction_id);
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+    """
+
+    # Columns added after their table was first released, for upgrading older databases
+    ADDED_COLUMNS = {
+        'sales': {'transaction_id': 'INTEGER'}
+    }
+
+    VERSION_TRIGGER = """
+        INSERT OR IGNORE INTO table_versions (name) VALUES ('{table}');
+        CREATE TRIGGER IF NOT EXISTS {table}_version_{event} AFTER {event} ON {table}
+        BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+        END;
+    """
+
+    def __init__(self, path: str = "data/bbmobile.db"):
+        self.path = path
+
+    @property
+    def cache_key(self) -> str:
+        return os.path.abspath(self.path)
+
+    @property
+    def lock_path(self) -> str:
+        return f"{self.path}.lock"
+
+    def fingerprint(self, *tables: str) -> tuple:
+        # Triggers bump a per-table version on every write, so unrelated writes
+        # don't invalidate cached copies of these tables
+        placeholders = ', '.join('?' for _ in tables)
+        with self._connect() as conn:
+            versions = dict(conn.execute(
+                f"SELECT name, version FROM table_versions WHERE name IN ({placeholders})", tables
+            ).fetchall())
+        return tuple(versions.get(table, 0) for table in tables)
+
+    @contextmanager
+    def _connect(self):
+        # A connection per call keeps this safe across Streamlit's script threads
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def ensure_tables(self) -> list:
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with self._connect() as conn:
+            # SQLite's own write-ahead log: appends plus checkpoints, crash-safe and readable while writing
+            conn.execute("PRAGMA journal_mode=WAL")
+            existing = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            for table, added in self.ADDED_COLUMNS.items():
+                if table in existing:
+                    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                    for column, column_type in added.items():
+                        if column not in columns:
+                            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+            conn.executescript(self.SCHEMA)
+            for table in TABLES:
+                for event in ('INSERT', 'UPDATE', 'DELETE'):
+                    conn.executescript(self.VERSION_TRIGGER.format(table=table, event=event))
+        return [table for table in TABLES if table not in existing]
+
+    @staticmethod
+    def _order_by(table: str) -> str:
+        return ', '.join(TABLE_KEYS.get(table, ['id']))
+
+    def read_table(self, table: str) -> pd.DataFrame:
+        columns = ', '.join(TABLES[table])
+        with self._connect() as conn:
+            df = pd.read_sql_query(
+                f"SELECT {columns} FROM {table} ORDER BY {self._order_by(table)}", conn
+            )
+        return apply_schema(df, table)
+
+    def write_table(self, table: str, df: pd.DataFrame) -> None:
+        columns = TABLES[table]
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM {table}")
+            conn.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                self._params(df, table, columns)
+            )
+
+    @staticmethod
+    def _params(df: pd.DataFrame, table: str, columns: list):
+        df = to_storage(df, table)[columns].astype(object)
+        return df.where(df.notna(), None).itertuples(index=False, name=None)
+
+    def insert_many(self, table: str, df: pd.DataFrame) -> range:
+        with self._connect() as conn:
+            return self._insert_many(conn, table, df)
+
+    def _insert_many(self, conn, table: str, df: pd.DataFrame) -> range:
+        columns = TABLES[table]
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+        first_id = (row[0] if row else 0) + 1
+        ids = range(first_id, first_id + len(df))
+        conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+            self._params(df.assign(id=list(ids)), table, columns)
+        )
+        return ids
+
+    def insert_transaction(self, header: dict, lines: pd.DataFrame) -> Tuple[int, range]:
+        # One connection, so the header and its lines commit together
+        with self._connect() as conn:
+            transaction_id = self._insert(conn, 'transactions', header)
+            return transaction_id, self._insert_many(conn, 'sales', lines.assign(transaction_id=transaction_id))
+
+    def get_row(self, table: str, row_id: int) -> Optional[dict]:
+        columns = TABLES[table]
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(columns)} FROM {table} WHERE id = ?", (int(row_id),)
+            ).fetchone()
+        return dict(zip(columns, row)) if row is not None else None
+
+    def insert(self, table: str, row: dict) -> int:
+        with self._connect() as conn:
+            return self._insert(conn, table, row)
+
+    @staticmethod
+    def _insert(conn, table: str, row: dict) -> int:
+        columns = [c for c in TABLES[table] if c in row]
+        placeholders = ', '.join('?' for _ in columns)
+        cursor = conn.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+            [row[c] for c in columns]
+        )
+        return cursor.lastrowid
+
+    def delete(self, table: str, row_id: int) -> None:
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM {table} WHERE id = ?", (int(row_id),))
+
+    def update(self, table: str, row_id: int, changes: dict) -> None:
+        assignments = ', '.join(f"{c} = ?" for c in changes)
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE {table} SET {assignments} WHERE id = ?",
+                [*changes.values(), int(row_id)]
+            )
+
+    def increment(self, table: str, key: dict, deltas: dict, values: Optional[dict] = None) -> None:
+        values = values or {}
+        columns = list(key) + list(deltas) + list(values)
+        updates = [f"{c} = {c} + excluded.{c}" for c in deltas] + [f"{c} = excluded.{c}" for c in values]
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+                f"ON CONFLICT ({', '.join(TABLE_KEYS[table])}) DO UPDATE SET {', '.join(updates)}",
+                [*key.values(), *deltas.values(), *values.values()]
+            )
+
+    def increment_many(self, table: str, rows: pd.DataFrame, maxima: tuple = ()) -> None:
+        columns = TABLES[table]
+        key_columns = TABLE_KEYS[table]
+        updates = [
+            f"{c} = COALESCE(MAX({c}, excluded.{c}), excluded.{c}, {c})" if c in maxima
+            else f"{c} = {c} + excluded.{c}"
+            for c in columns if c not in key_columns
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+                f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET {', '.join(updates)}",
+                self._params(rows, table, columns)
+            )
+
+    def latest_date(self, table: str, column: str, value) -> Optional[str]:
+        with self._connect() as conn:
+            (latest,) = conn.execute(
+                f"SELECT MAX(date) FROM {table} WHERE {column} = ?", (value,)
+            ).fetchone()
+        return latest
+
+    @staticmethod
+    def _date_clause(start: Optional[date], end: Optional[date], column: str = 'date'):
+        conditions, params = [], []
+        if start is not None:
+            conditions.append(f"{column} >= ?")
+            params.append(iso_date(start))
+        if end is not None:
+            conditions.append(f"{column} <= ?")
+            params.append(iso_date(end))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, params
+
+    def read_range(self, table: str, start: Optional[date] = None,
+                   end: Optional[date] = None) -> pd.DataFrame:
+        where, params = self._date_clause(start, end)
+        columns = ', '.join(TABLES[table])
+        with self._connect() as conn:
+            df = pd.read_sql_query(
+                f"SELECT {columns} FROM {table} {where} ORDER BY {self._order_by(table)}",
+                conn,
+                params=params
+            )
+        return apply_schema(df, table)
+
+    @staticmethod
+    def _sales_query(where: str, order_by: str = 's.date, s.id', limit: str = '') -> str:
+        return f"""
+            SELECT s.id AS sale_id, s.product_id, s.quantity, s.price AS sale_price, s.date, s.transaction_id,
+                   p.name, p.category, p.price AS product_price, p.created_at, p.notes
+            FROM sales s
+            JOIN products p ON p.id = s.product_id
+            {where}
+            ORDER BY {order_by}
+            {limit}
+        """
+
+    @staticmethod
+    def _joined_schema(df: pd.DataFrame) -> pd.DataFrame:
+        df = apply_schema(df, 'sales', SALES_RENAMES)
+        return apply_schema(df, 'products', PRODUCT_RENAMES)
+
+    def query_sales(self, start: Optional[date] = None,
+                    end: Optional[date] = None) -> pd.DataFrame:
+        where, params = self._date_clause(start, end, column='s.date')
+        with self._connect() as conn:
+            df = pd.read_sql_query(self._sales_query(where), conn, params=params)
+        return self._joined_schema(df)
+
+    def query_product_sales(self, product_id: int) -> pd.DataFrame:
+        with self._connect() as conn:
+            df = pd.read_sql_query(self._sales_query("WHERE s.product_id = ?"), conn, params=[int(product_id)])
+        return self._joined_schema(df)
+
+    def iter_sales(self, start: Optional[date] = None, end: Optional[date] = None,
+                   chunksize: int = 50_000) -> Iterator[pd.DataFrame]:
+        # The cursor is read a chunk at a time, so only one chunk is ever in memory
+        where, params = self._date_clause(start, end, column='s.date')
+        with self._connect() as conn:
+            for chunk in pd.read_sql_query(self._sales_query(where), conn, params=params, chunksize=chunksize):
+                yield self._joined_schema(chunk)
+
+    def query_sales_page(self, start: Optional[date] = None, end: Optional[date] = None,
+                         offset: int = 0, limit: int = 50, sort: str = 'date', descending: bool = True,
+                         filters: Optional[dict] = None) -> Page:
+        # Only the page's rows are read; sorting by date or ID walks an index
+        where, params = self._date_clause(start, end, column='s.date')
+        conditions = [where[len('WHERE '):]] if where else []
+        for column, value in (filters or {}).items():
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            conditions.append(f"{SALES_PAGE_COLUMNS[column]} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        direction = 'DESC' if descending else 'ASC'
+        order_by = f"{SALES_PAGE_COLUMNS[sort]} {direction}, s.id {direction}"
+        with self._connect() as conn:
+            (total,) = conn.execute(
+                f"SELECT COUNT(*) FROM sales s JOIN products p ON p.id = s.product_id {where}", params
+            ).fetchone()
+            df = pd.read_sql_query(
+                self._sales_query(where, order_by, 'LIMIT ? OFFSET ?'), conn, params=[*params, limit, offset]
+            )
+        return Page(self._joined_schema(df), total, offset, limit)
+
+
+class PartitionedCSVBackend(CSVBackend):
+    """CSV tables, except sales and expenses, which are split into one file per month.
+
+    Partitions live under <data_dir>/<table>/YYYY-MM.csv and are listed in
+    a manifest with their row counts and ID ranges, so date-range reads
+    open only the months they cover and ID lookups only the months that
+    can hold the ID. Writes touch only the partitions they change. Closed
+    months can be compacted to Parquet, which reads several times faster.
+
+    Partition files are fsynced before the manifest is atomically replaced,
+    so after a crash the files are never behind the manifest; startup
+    recovery recounts them and brings the manifest up to date.
+    """
+
+    PARTITIONED = ('sales', 'expenses')
+    MANIFEST_FILE = 'manifest.json'
+
+    @property
+    def _manifest_path(self) -> str:
+        return os.path.join(self.data_dir, self.MANIFEST_FILE)
+
+    def _partition_path(self, table: str, month: str, fmt: str) -> str:
+        return os.path.join(self.data_dir, table, f"{month}.{fmt}")
+
+    def _read_manifest(self) -> dict:
+        if not os.path.exists(self._manifest_path):
+            return {table: {'version': 0, 'partitions': {}} for table in self.PARTITIONED}
+        with open(self._manifest_path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest: dict, *changed: str) -> None:
+        for table in changed:
+            manifest[table]['version'] += 1
+            manifest[table]['partitions'] = dict(sorted(manifest[table]['partitions'].items()))
+        tmp_path = f"{self._manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._manifest_path)
+
+    def fingerprint(self, *tables: str) -> tuple:
+        manifest = None
+        parts = []
+        for table in tables:
+            if table in self.PARTITIONED:
+                manifest = manifest or self._read_manifest()
+                parts.append(manifest[table]['version'])
+            else:
+                parts.extend(super().fingerprint(table))
+        return tuple(parts)
+
+    def ensure_tables(self) -> list:
+        created = super().ensure_tables()
+        for table in self.PARTITIONED:
+            os.makedirs(os.path.join(self.data_dir, table), exist_ok=True)
+
+        if not os.path.exists(self._manifest_path):
+            # First start: split the single-file tables into months, leaving the files themselves in place
+            manifest = self._read_manifest()
+            for table in self.PARTITIONED:
+                self._write_partitions(manifest, table, super().read_table(table))
+            self._write_manifest(manifest, *self.PARTITIONED)
+        self.compact()
+        return created
+
+    # Partition files
+
+    @staticmethod
+    def _months(df: pd.DataFrame) -> pd.Series:
+        return pd.to_datetime(df['date'], format=DATE_FORMAT).dt.strftime('%Y-%m')
+
+    def _read_partition(self, table: str, month: str, fmt: str) -> pd.DataFrame:
+        path = self._partition_path(table, month, fmt)
+        if fmt == 'parquet':
+            return apply_schema(pd.read_parquet(path), table)
+        dates = DATE_COLUMNS[table]
+        return pd.read_csv(path, dtype=SCHEMAS[table], parse_dates=list(dates), date_format=dates)
+
+    def _write_partition(self, manifest: dict, table: str, month: str, df: pd.DataFrame,
+                         fmt: Optional[str] = None) -> None:
+        """Replace one month's file, keeping its format unless told otherwise"""
+        partitions = manifest[table]['partitions']
+        old = partitions.get(month)
+        fmt = fmt or (old['format'] if old else 'csv')
+
+        if df.empty:
+            partitions.pop(month, None)
+        else:
+            path = self._partition_path(table, month, fmt)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                if fmt == 'parquet':
+                    apply_schema(df.reindex(columns=TABLES[table]), table).to_parquet(f, index=False)
+                else:
+                    to_storage(df, table).to_csv(f, index=False, lineterminator='\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            partitions[month] = self._partition_entry(df, fmt)
+
+        if old and (df.empty or old['format'] != fmt):
+            os.remove(self._partition_path(table, month, old['format']))
+
+    @staticmethod
+    def _partition_entry(df: pd.DataFrame, fmt: str) -> dict:
+        return {'format': fmt, 'rows': len(df), 'min_id': int(df['id'].min()), 'max_id': int(df['id'].max())}
+
+    def _write_partitions(self, manifest: dict, table: str, df: pd.DataFrame, replace: bool = False) -> None:
+        """Write df month by month; with replace, months missing from df are emptied"""
+        months = self._months(df)
+        touched = set()
+        for month, rows in df.groupby(months, sort=True):
+            self._write_partition(manifest, table, month, rows)
+            touched.add(month)
+        if replace:
+            for month in set(manifest[table]['partitions']) - touched:
+                self._write_partition(manifest, table, month, df.iloc[0:0])
+
+    def _partitions(self, table: str, start: Optional[date] = None, end: Optional[date] = None,
+                    row_id: Optional[int] = None) -> list:
+        """(month, format) of the partitions that may hold rows in [start, end], or the given ID"""
+        first = iso_date(start)[:7] if start is not None else None
+        last = iso_date(end)[:7] if end is not None else None
+        return [
+            (month, entry['format'])
+            for month, entry in self._read_manifest()[table]['partitions'].items()
+            if (first is None or month >= first) and (last is None or month <= last)
+            and (row_id is None or entry['min_id'] <= row_id <= entry['max_id'])
+        ]
+
+    def _concat(self, table: str, parts: list) -> pd.DataFrame:
+        frames = [self._read_partition(table, month, fmt) for month, fmt in parts]
+        if not frames:
+            return apply_schema(pd.DataFrame(columns=TABLES[table]), table)
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def indexes(self, table: str) -> bool:
+        # Other tables are single files, which DataManager reads faster from its cache
+        return table in self.PARTITIONED
+
+    def log_since(self, table: str, fingerprint) -> Optional[list]:
+        if table in self.PARTITIONED:
+            return None
+        return super().log_since(table, fingerprint)
+
+    def _max_id(self, table: str) -> int:
+        if table not in self.PARTITIONED:
+            return super()._max_id(table)
+        partitions = self._read_manifest()[table]['partitions'].values()
+        return max((entry['max_id'] for entry in partitions), default=0)
+
+    # Table operations
+
+    def read_table(self, table: str) -> pd.DataFrame:
+        if table not in self.PARTITIONED:
+            return super().read_table(table)
+        return self._concat(table, self._partitions(table))
+
+    def read_range(self, table: str, start: Optional[date] = None,
+                   end: Optional[date] = None) -> pd.DataFrame:
+        if table not in self.PARTITIONED:
+            return super().read_range(table, start, end)
+        df = self._concat(table, self._partitions(table, start, end))
+        if start is not None:
+            df = df[df['date'] >= pd.Timestamp(iso_date(start))]
+        if end is not None:
+            df = df[df['date'] <= pd.Timestamp(iso_date(end))]
+        return df.reset_index(drop=True)
+
+    def iter_sales(self, start: Optional[date] = None, end: Optional[date] = None,
+                   chunksize: int = 50_000) -> Iterator[pd.DataFrame]:
+        # A month at a time, so only one partition is in memory
+        products = self.read_table('products')
+        for month, fmt in self._partitions('sales', start, end):
+            sales = self._read_partition('sales', month, fmt)
+            if start is not None:
+                sales = sales[sales['date'] >= pd.Timestamp(iso_date(start))]
+            if end is not None:
+                sales = sales[sales['date'] <= pd.Timestamp(iso_date(end))]
+            joined = join_sales(sales, products).sort_values(['date', 'sale_id'], ignore_index=True)
+            for offset in range(0, len(joined), chunksize):
+                yield joined.iloc[offset:offset + chunksize]
+
+    def write_table(self, table: str, df: pd.DataFrame) -> None:
+        if table not in self.PARTITIONED:
+            return super().write_table(table, df)
+        manifest = self._read_manifest()
+        self._write_partitions(manifest, table, df, replace=True)
+        self._write_manifest(manifest, table)
+
+    def insert(self, table: str, row: dict) -> int:
+        if table not in self.PARTITIONED:
+            return super().insert(table, row)
+        return self.insert_many(table, pd.DataFrame([row]))[0]
+
+    def insert_many(self, table: str, df: pd.DataFrame) -> range:
+        if table not in self.PARTITIONED:
+            return super().insert_many(table, df)
+        last_id = self._next_id(table, len(df))
+        ids = range(last_id - len(df) + 1, last_id + 1)
+        df = df.assign(id=list(ids))
+
+        manifest = self._read_manifest()
+        partitions = manifest[table]['partitions']
+        current_month = date.today().isoformat()[:7]
+        opened_current_month = current_month not in partitions
+        for month, rows in df.groupby(self._months(df), sort=True):
+            entry = partitions.get(month)
+            if entry is not None and entry['format'] == 'parquet':
+                # Back-dated rows for a compacted month: rewrite that month only
+                existing = self._read_partition(table, month, 'parquet')
+                rows = apply_schema(rows.reindex(columns=TABLES[table]), table)
+                self._write_partition(manifest, table, month, pd.concat([existing, rows], ignore_index=True))
+                continue
+
+            path = self._partition_path(table, month, 'csv')
+            with open(path, 'a', newline='') as f:
+                if entry is None:
+                    f.write(','.join(TABLES[table]) + '\n')
+                elif self._needs_newline(path):
+                    f.write('\n')
+                to_storage(rows, table).to_csv(f, header=False, index=False, lineterminator='\n')
+                f.flush()
+                os.fsync(f.fileno())
+            if entry is None:
+                partitions[month] = self._partition_entry(rows, 'csv')
+            else:
+                entry.update(rows=entry['rows'] + len(rows), max_id=max(entry['max_id'], int(rows['id'].max())),
+                             min_id=min(entry['min_id'], int(rows['id'].min())))
+        self._write_manifest(manifest, table)
+        if opened_current_month and current_month in partitions:
+            # The first write of a new month closes the previous ones
+            self.compact()
+        return ids
+
+    def _rewrite_row(self, table: str, row_id: int, change) -> None:
+        """Apply change to the partition holding row_id, if any"""
+        manifest = self._read_manifest()
+        for month, fmt in self._partitions(table, row_id=row_id):
+            df = self._read_partition(table, month, fmt)
+            match = df['id'] == row_id
+            if match.any():
+                self._write_partition(manifest, table, month, change(df, match))
+                self._write_manifest(manifest, table)
+                return
+
+    def get_row(self, table: str, row_id: int) -> Optional[dict]:
+        if table not in self.PARTITIONED:
+            return super().get_row(table, row_id)
+        for month, fmt in self._partitions(table, row_id=row_id):
+            df = self._read_partition(table, month, fmt)
+            match = df[df['id'] == row_id]
+            if not match.empty:
+                return match.iloc[0].to_dict()
+        return None
+
+    def delete(self, table: str, row_id: int) -> None:
+        if table not in self.PARTITIONED:
+            return super().delete(table, row_id)
+        self._rewrite_row(table, row_id, lambda df, match: df[~match])
+
+    def update(self, table: str, row_id: int, changes: dict) -> None:
+        if table not in self.PARTITIONED:
+            return super().update(table, row_id, changes)
+        self._rewrite_row(table, row_id, lambda df, match: assign_where(df, match, changes))
+
+    def latest_date(self, table: str, column: str, value) -> Optional[str]:
+        # Newest month first; the first month with a match holds the latest date
+        for month, fmt in reversed(self._partitions(table)):
+            df = self._read_partition(table, month, fmt)
+            dates = df.loc[df[column] == value, 'date']
+            if not dates.empty:
+                return iso_date(dates.max())
+        return None
+
+    def recover(self) -> list:
+        """Bring the manifest back in line with the partition files after a crash.
+
+        A crash after a partition was written but before the manifest was
+        replaced leaves rows, a month, or a format change the manifest
+        doesn't know about. A half-written last row is cut off, then every
+        month is recounted from its file and changed tables get a new version.
+        """
+        recovered = super().recover()
+        if not os.path.exists(self._manifest_path):
+            return recovered  # ensure_tables builds it from the single-file tables
+
+        manifest = self._read_manifest()
+        changed = []
+        for table in self.PARTITIONED:
+            partitions = manifest[table]['partitions']
+            formats = {}
+            for path in glob.glob(os.path.join(self.data_dir, table, '*.csv')) + \
+                    glob.glob(os.path.join(self.data_dir, table, '*.parquet')):
+                month, fmt = os.path.basename(path).split('.')
+                formats.setdefault(month, set()).add(fmt)
+
+            for month in set(partitions) | set(formats):
+                found = formats.get(month, set())
+                if 'parquet' in found and 'csv' in found:
+                    # A Parquet file is only put in place complete; the CSV it replaced outlived the crash
+                    os.remove(self._partition_path(table, month, 'csv'))
+                    found = {'parquet'}
+                entry = None
+                if found:
+                    fmt = found.pop()
+                    path = self._partition_path(table, month, fmt)
+                    if fmt == 'csv' and self._needs_newline(path):
+                        with open(path, 'rb+') as f:
+                            f.truncate(f.read().rfind(b'\n') + 1)
+                            f.flush()
+                            os.fsync(f.fileno())
+                    if fmt == 'parquet':
+                        ids = pd.read_parquet(path, columns=['id'])
+                    else:
+                        ids = pd.read_csv(path, usecols=['id'])
+                    if ids.empty:
+                        os.remove(path)
+                    else:
+                        entry = self._partition_entry(ids, fmt)
+                if entry != partitions.get(month):
+                    if entry is None:
+                        partitions.pop(month, None)
+                    else:
+                        partitions[month] = entry
+                    if table not in changed:
+                        changed.append(table)
+        if changed:
+            self._write_manifest(manifest, *changed)
+        return recovered + [table for table in changed if table not in recovered]
+
+    def compact(self, before: Optional[date] = None) -> list:
+        """Convert CSV partitions of months before `before` (default: this month) to Parquet.
+
+        Returns the (table, month) pairs compacted. Does nothing if pyarrow
+        isn't installed.
+        """
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return []
+
+        cutoff = iso_date(before or date.today())[:7]
+        manifest = self._read_manifest()
+        compacted = []
+        for table in self.PARTITIONED:
+            for month, entry in list(manifest[table]['partitions'].items()):
+                if month < cutoff and entry['format'] == 'csv':
+                    df = self._read_partition(table, month, 'csv')
+                    self._write_partition(manifest, table, month, df, fmt='parquet')
+                    compacted.append((table, month))
+        if compacted:
+            self._write_manifest(manifest, *{table for table, _ in compacted})
+        return compacted
+
+
+def get_backend(data_dir: str = "data", kind: Optional[str] = None) -> StorageBackend:
+    """Pick the storage backend, by default from the BBMOBILE_STORAGE environment variable"""
+    kind = (kind or os.environ.get('BBMOBILE_STORAGE', 'csv')).lower()
+    if kind == 'sqlite':
+        return SQLiteBackend(os.path.join(data_dir, 'bbmobile.db'))
+    if kind == 'csv':
+        return CSVBackend(data_dir)
+    if kind == 'partitioned':
+        return PartitionedCSVBackend(data_dir)
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+def migrate_csv_to_sqlite(data_dir: str = "data", db_path: Optional[str] = None) -> dict:
+    """Copy the CSV tables into a fresh SQLite database, keeping their IDs"""
+    source = CSVBackend(data_dir)
+    target = SQLiteBackend(db_path or os.path.join(data_dir, 'bbmobile.db'))
+    target.ensure_tables()
+
+    with target._connect() as conn:
+        for table in BASE_TABLES:
+            (existing,) = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+            if existing:
+                raise RuntimeError(f"{target.path} already has {table}; refusing to migrate twice")
+
+    copied = {}
+    for table in BASE_TABLES:
+        if not os.path.exists(source._path(table)):
+            continue
+        df = source.read_table(table)
+        target.write_table(table, df)
+        copied[table] = len(df)
+
+    derived = build_derived_tables(target.query_sales(), target.read_table('expenses'))
+    for table, df in derived.items():
+        target.write_table(table, df)
+
+    with target._connect() as conn:
+        # Keep AUTOINCREMENT counting past any IDs the CSV sequences already handed out
+        seq_path = os.path.join(data_dir, CSVBackend.SEQUENCES_FILE)
+        if os.path.exists(seq_path):
+            with open(seq_path) as f:
+                for table, last_id in json.load(f).items():
+                    updated = conn.execute(
+                        "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?",
+                        (last_id, table)
+                    ).rowcount
+                    if not updated:
+                        conn.execute(
+                            "INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)",
+                            (table, last_id)
+                        )
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="B&B Mobile storage tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate = subparsers.add_parser('migrate', help="Copy the CSV data into a SQLite database")
+    migrate.add_argument('--data-dir', default='data')
+    migrate.add_argument('--db', default=None, help="Defaults to <data-dir>/bbmobile.db")
+
+    compact = subparsers.add_parser('compact', help="Convert closed months of partitioned tables to Parquet")
+    compact.add_argument('--data-dir', default='data')
+    compact.add_argument('--before', type=date.fromisoformat, help="Compact months before this date (default: today)")
+
+    args = parser.parse_args()
+    if args.command == 'migrate':
+        copied = migrate_csv_to_sqlite(args.data_dir, args.db)
+        for table, n in copied.items():
+            print(f"{table}: {n} rows")
+    elif args.command == 'compact':
+        backend = PartitionedCSVBackend(args.data_dir)
+        # Held like the app's writer holds it, so a running app doesn't write mid-compaction
+        with file_lock(backend.lock_path):
+            backend.ensure_tables()
+            backend.recover()
+            compacted = backend.compact(args.before)
+        for table, month in compacted:
+            print(f"{table}: compacted {month}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+from datetime import date, timedelta
+from typing import Iterable
+
+import pandas as pd
+
+# Pandas period codes for each supported granularity
+PERIODS = {'day': 'D', 'week': 'W', 'month': 'M'}
+
+# Per-day amounts carried onto the calendar; profit is derived from them
+AMOUNT_COLUMNS = ['revenue', 'expenses', 'quantity', 'sale_count']
+SERIES_COLUMNS = ['revenue', 'expenses', 'profit']
+
+
+def period_start(day: date, period: str) -> date:
+    """First day of the day, week (Monday) or month containing day"""
+    return pd.Period(day, PERIODS[period]).start_time.date()
+
+
+def lookback_start(start_date: date, period: str = 'day', windows: Iterable[int] = ()) -> date:
+    """Earliest day needed to compute periods, deltas and windows from start_date.
+
+    That is the start of the period before the one containing start_date,
+    or far enough back to fill the longest rolling window, whichever is
+    earlier.
+    """
+    previous_period = period_start(period_start(start_date, period) - timedelta(days=1), period)
+    longest = max(windows, default=1)
+    return min(previous_period, start_date - timedelta(days=longest - 1))
+
+
+def calendar(daily_summary: pd.DataFrame, start_date: date, end_date: date) -> pd.DataFrame:
+    """Daily amounts and profit on a complete calendar from start_date to end_date.
+
+    Days without a rollup row are zero, so every later window and bucket
+    spans real calendar time rather than only the days with activity.
+    """
+    index = pd.date_range(start_date, end_date, name='date')
+    daily = daily_summary.set_index('date')[AMOUNT_COLUMNS].reindex(index, fill_value=0)
+    return daily.assign(profit=daily['revenue'] - daily['expenses'])
+
+
+def resample(daily: pd.DataFrame, period: str = 'day') -> pd.DataFrame:
+    """Sum a calendar into day, week or month buckets, indexed by each bucket's first day"""
+    if period == 'day':
+        return daily
+    buckets = daily.groupby(daily.index.to_period(PERIODS[period])).sum()
+    buckets.index = buckets.index.to_timestamp().rename('date')
+    return buckets
+
+
+def rolling_windows(daily: pd.DataFrame, windows: Iterable[int] = (7, 30),
+                    columns: Iterable[str] = SERIES_COLUMNS) -> pd.DataFrame:
+    """Trailing n-day averages of a calendar's columns, e.g. revenue_7d"""
+    columns = list(columns)
+    return pd.concat(
+        [daily[columns].rolling(window, min_periods=1).mean().add_suffix(f'_{window}d') for window in windows],
+        axis=1
+    )
+
+
+def period_deltas(buckets: pd.DataFrame, columns: Iterable[str] = SERIES_COLUMNS) -> pd.DataFrame:
+    """Change and percentage change of each bucket against the one before it"""
+    columns = list(columns)
+    change = buckets[columns].diff()
+    previous = buckets[columns].shift()
+    pct_change = (change / previous.abs().where(previous != 0)) * 100
+    return pd.concat([change.add_suffix('_change'), pct_change.add_suffix('_pct_change')], axis=1)
@@ -0,0 +1,123 @@
+import functools
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: only writers within this process are serialized
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: str):
+    """Hold an exclusive lock on path, shared by every process using the same data"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class WriteQueue:
+    """Runs every mutation of one data source on a single background thread.
+
+    Queued writes are taken in batches; each batch runs under one
+    acquisition of the cross-process file lock, so concurrent clerks share
+    the locking cost instead of each paying it.
+
+    A marker file exists while a batch runs. Finding it on taking the lock
+    means the last writer died mid-batch, possibly between the steps of one
+    mutation, so `on_interrupted` is called first to repair what it may
+    have left half done. Until a repair succeeds the marker stays.
+    """
+
+    MAX_BATCH = 64
+
+    def __init__(self, lock_path: str):
+        self.lock_path = lock_path
+        self.dirty_path = f"{lock_path}.dirty"
+        self.on_interrupted = None
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="bbmobile-writer", daemon=True)
+        self._thread.start()
+
+    def run(self, fn):
+        """Run fn on the writer thread and return its result"""
+        if threading.current_thread() is self._thread:
+            # Already inside a write; nested mutations run inline
+            return fn()
+        return self.submit(fn).result()
+
+    def submit(self, fn) -> Future:
+        """Queue fn to run on the writer thread after the writes already queued, without waiting"""
+        future = Future()
+        self._queue.put((fn, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                # Failing to lock or mark must not stop the thread: callers wait on their futures forever
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _run_batch(self, batch: list) -> None:
+        with file_lock(self.lock_path):
+            interrupted = os.path.exists(self.dirty_path) and not self._repair()
+            open(self.dirty_path, 'a').close()
+            for fn, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(fn())
+                except BaseException as e:
+                    future.set_exception(e)
+            if not interrupted:
+                os.remove(self.dirty_path)
+
+    def _repair(self) -> bool:
+        if self.on_interrupted is None:
+            return False
+        try:
+            self.on_interrupted()
+            return True
+        except Exception:
+            return False  # Left marked; the next batch tries again
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_write_queue(lock_path: str) -> WriteQueue:
+    """The process-wide write queue for the data guarded by lock_path"""
+    lock_path = os.path.abspath(lock_path)
+    with _queues_lock:
+        if lock_path not in _queues:
+            _queues[lock_path] = WriteQueue(lock_path)
+        return _queues[lock_path]
+
+
+def serialized(method):
+    """Route a DataManager mutation through its data source's write queue"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return self._writer.run(lambda: method(self, *args, **kwargs))
+    return wrapper